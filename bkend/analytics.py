@@ -0,0 +1,168 @@
+"""Time-bucketed vote rollups for editor analytics.
+
+Every vote change adds its net effect on upvotes/downvotes to one
+``vote_rollups`` row per granularity (minute, hour, day), in the same
+transaction as the vote. Range and trending queries read only rollup rows, so
+their cost is proportional to the number of buckets, never to raw votes.
+Fine-grained buckets are pruned by a compaction job once they age out; daily
+buckets are kept.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .models import VoteRollup
+from .schemas import RollupGranularity
+
+# How long each granularity is kept before the compactor drops it.
+RETENTION: Dict[RollupGranularity, Optional[timedelta]] = {
+    RollupGranularity.MINUTE: timedelta(days=2),
+    RollupGranularity.HOUR: timedelta(days=90),
+    RollupGranularity.DAY: None,
+}
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE; others use _add_to_bucket.
+_UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def to_utc_naive(ts: datetime) -> datetime:
+    # Rollup buckets are stored as naive UTC, matching what SQLite returns.
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def bucket_start(ts: datetime, granularity: RollupGranularity) -> datetime:
+    ts = to_utc_naive(ts)
+    if granularity == RollupGranularity.MINUTE:
+        return ts.replace(second=0, microsecond=0)
+    if granularity == RollupGranularity.HOUR:
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def record_vote_delta(
+        db: Session,
+        article_id: int,
+        upvotes: int,
+        downvotes: int,
+        at: Optional[datetime] = None
+    ) -> None:
+    """Add a vote change to every granularity's bucket (no commit)."""
+    if not upvotes and not downvotes:
+        return
+    at = at or datetime.now(timezone.utc)
+    rows = [
+        {
+            "article_id": article_id,
+            "granularity": granularity.value,
+            "bucket_start": bucket_start(at, granularity),
+            "upvotes": upvotes,
+            "downvotes": downvotes,
+        }
+        for granularity in RollupGranularity
+    ]
+    dialect_insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if dialect_insert is not None:
+        stmt = dialect_insert(VoteRollup).values(rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[VoteRollup.article_id, VoteRollup.granularity, VoteRollup.bucket_start],
+            set_={
+                "upvotes": VoteRollup.upvotes + stmt.excluded.upvotes,
+                "downvotes": VoteRollup.downvotes + stmt.excluded.downvotes,
+            },
+        ))
+        return
+    for row in rows:
+        _add_to_bucket(db, row)
+
+
+def _add_to_bucket(db: Session, row: dict) -> None:
+    # Portable fallback: update, else insert in a savepoint; a concurrent
+    # writer that created the bucket first makes the insert fail, and the
+    # update is then retried against its row.
+    bucket = (
+        VoteRollup.article_id == row["article_id"],
+        VoteRollup.granularity == row["granularity"],
+        VoteRollup.bucket_start == row["bucket_start"],
+    )
+    increment = update(VoteRollup).where(*bucket).values(
+        upvotes=VoteRollup.upvotes + row["upvotes"],
+        downvotes=VoteRollup.downvotes + row["downvotes"],
+    )
+    if db.execute(increment).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(VoteRollup).values(**row))
+    except IntegrityError:
+        db.execute(increment)
+
+
+def vote_series(
+        db: Session,
+        article_id: int,
+        granularity: RollupGranularity,
+        start: datetime,
+        end: datetime
+    ) -> List[dict]:
+    """Non-empty buckets of ``article_id`` with ``start <= bucket_start < end``."""
+    rows = db.execute(
+        select(VoteRollup.bucket_start, VoteRollup.upvotes, VoteRollup.downvotes)
+        .where(
+            VoteRollup.article_id == article_id,
+            VoteRollup.granularity == granularity.value,
+            VoteRollup.bucket_start >= bucket_start(start, granularity),
+            VoteRollup.bucket_start < to_utc_naive(end),
+        )
+        .order_by(VoteRollup.bucket_start)
+    ).all()
+    return [row._asdict() for row in rows]
+
+
+def trending(
+        db: Session,
+        since: datetime,
+        limit: int = 10,
+        granularity: RollupGranularity = RollupGranularity.HOUR
+    ) -> List[dict]:
+    """Articles ranked by net upvotes gained since ``since``."""
+    net = func.sum(VoteRollup.upvotes - VoteRollup.downvotes)
+    rows = db.execute(
+        select(
+            VoteRollup.article_id,
+            func.sum(VoteRollup.upvotes).label("upvotes"),
+            func.sum(VoteRollup.downvotes).label("downvotes"),
+            net.label("score"),
+        )
+        .where(
+            VoteRollup.granularity == granularity.value,
+            VoteRollup.bucket_start >= bucket_start(since, granularity),
+        )
+        .group_by(VoteRollup.article_id)
+        .order_by(net.desc(), VoteRollup.article_id)
+        .limit(limit)
+    ).all()
+    return [row._asdict() for row in rows]
+
+
+def compact(db: Session, now: Optional[datetime] = None) -> int:
+    """Drop buckets older than their granularity's retention; returns rows removed."""
+    now = to_utc_naive(now or datetime.now(timezone.utc))
+    removed = 0
+    for granularity, keep in RETENTION.items():
+        if keep is None:
+            continue
+        result = db.execute(
+            delete(VoteRollup).where(
+                VoteRollup.granularity == granularity.value,
+                VoteRollup.bucket_start < now - keep,
+            )
+        )
+        removed += result.rowcount
+    db.commit()
+    return removed
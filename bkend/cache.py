@@ -0,0 +1,175 @@
+"""In-process cache of serialized article list pages.
+
+Each entry keeps the raw JSON body plus any compressed variants produced so
+far, so a popular page is serialized once and compressed at most once per
+encoding until the next write invalidates it.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional
+
+from starlette.responses import Response
+
+from .compression import DEFAULT_MINIMUM_SIZE, compress, is_compressible, negotiate_encoding
+
+
+class CachedPage:
+    def __init__(self, body: bytes, media_type: str = "application/json") -> None:
+        self.body = body
+        self.media_type = media_type
+        self._digest = hashlib.sha1(body).hexdigest()
+        self.etag = self.etag_for(None)
+        self._encoded: Dict[str, bytes] = {}
+        self._rows: Optional[Any] = None
+        self._lock = threading.Lock()
+
+    def rows(self) -> Any:
+        """The JSON body decoded once, for callers that post-process the page."""
+        if self._rows is None:
+            self._rows = json.loads(self.body)
+        return self._rows
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        """Strong ETag of the variant sent with ``encoding`` (None: identity).
+
+        Each encoding is a different byte sequence, so each gets its own tag.
+        """
+        if encoding is None:
+            return f'"{self._digest}"'
+        return f'"{self._digest}-{encoding}"'
+
+    def encoded(self, encoding: str) -> bytes:
+        """Return the body compressed with ``encoding``, compressing on first use."""
+        data = self._encoded.get(encoding)
+        if data is None:
+            with self._lock:
+                data = self._encoded.get(encoding)
+                if data is None:
+                    data = compress(self.body, encoding)
+                    self._encoded[encoding] = data
+        return data
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of ``etag`` against an ``If-None-Match`` header value.
+
+    The header may list several tags, any of them weak (``W/"..."``), or be
+    ``*``.
+    """
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class CachedPageResponse(Response):
+    """Serve a :class:`CachedPage`, picking the stored variant per request.
+
+    Negotiation happens at send time because the endpoint never sees the
+    request headers; the ``Content-Encoding`` header set here makes the
+    compression middleware leave the body alone.
+    """
+
+    def __init__(
+            self,
+            page: CachedPage,
+            minimum_size: int = DEFAULT_MINIMUM_SIZE,
+            headers: Optional[Mapping[str, str]] = None
+        ) -> None:
+        super().__init__(content=page.body, media_type=page.media_type)
+        self.page = page
+        self.minimum_size = minimum_size
+        self.extra_headers = [
+            (k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in (headers or {}).items()
+        ]
+
+    async def __call__(self, scope, receive, send) -> None:
+        request_headers = dict(scope.get("headers") or [])
+        encoding = None
+        if len(self.page.body) >= self.minimum_size and is_compressible(self.media_type):
+            encoding = negotiate_encoding(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        etag = self.page.etag_for(encoding)
+        if_none_match = request_headers.get(b"if-none-match")
+        if if_none_match is not None and etag_matches(if_none_match.decode("latin-1"), etag):
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [
+                    (b"etag", etag.encode("latin-1")),
+                    (b"vary", b"Accept-Encoding"),
+                    *self.extra_headers,
+                ],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        body = self.page.body
+        headers = [(b"content-type", self.media_type.encode("latin-1"))] if self.media_type else []
+        if encoding is not None:
+            body = self.page.encoded(encoding)
+            headers.append((b"content-encoding", encoding.encode("latin-1")))
+        headers += [
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"etag", etag.encode("latin-1")),
+            (b"vary", b"Accept-Encoding"),
+            *self.extra_headers,
+        ]
+        await send({"type": "http.response.start", "status": self.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+class PageCache:
+    """Bounded LRU of :class:`CachedPage` entries, cleared on any article write."""
+
+    def __init__(self, maxsize: int = 128) -> None:
+        self.maxsize = maxsize
+        self._pages: "OrderedDict[Hashable, CachedPage]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def get_or_build(
+            self,
+            key: Hashable,
+            build: Callable[[], bytes],
+            media_type: str = "application/json"
+        ) -> CachedPage:
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                return page
+            generation = self._generation
+        page = CachedPage(build(), media_type=media_type)
+        with self._lock:
+            # Don't store a page built from data that a concurrent write has
+            # already invalidated.
+            if generation == self._generation:
+                self._pages[key] = page
+                if len(self._pages) > self.maxsize:
+                    self._pages.popitem(last=False)
+        return page
+
+    def get(self, key: Hashable) -> Optional[CachedPage]:
+        with self._lock:
+            return self._pages.get(key)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._pages.clear()
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+
+# Anonymous article list pages, keyed by (skip, limit), plus the server-side
+# rendered front-end index.
+article_pages = PageCache()
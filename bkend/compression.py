@@ -0,0 +1,171 @@
+"""Response compression: content negotiation, encoders and ASGI middleware.
+
+gzip is always available (stdlib). brotli and zstd are used when the optional
+``brotli`` / ``zstandard`` packages are installed; otherwise they are simply
+never negotiated.
+"""
+import gzip
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:  # optional dependency
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover - depends on environment
+    brotli = None
+
+try:  # optional dependency
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover - depends on environment
+    zstandard = None
+
+# Bodies smaller than this are sent as-is: below a few hundred bytes the
+# encoding overhead outweighs the savings.
+DEFAULT_MINIMUM_SIZE = int(os.getenv("BACKEND_COMPRESSION_MIN_SIZE", "500"))
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def _gzip(data: bytes) -> bytes:
+    # mtime=0 keeps the output deterministic so cached variants are stable.
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {}
+if brotli is not None:
+    ENCODERS["br"] = lambda data: brotli.compress(data, quality=5)
+if zstandard is not None:
+    ENCODERS["zstd"] = lambda data: zstandard.ZstdCompressor(level=6).compress(data)
+ENCODERS["gzip"] = _gzip
+
+# Server-side preference when the client weights several encodings equally.
+PREFERENCE = tuple(ENCODERS)
+
+
+def available_encodings() -> Tuple[str, ...]:
+    return PREFERENCE
+
+
+def _parse_accept_encoding(header: str) -> Dict[str, float]:
+    weights: Dict[str, float] = {}
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+    return weights
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best supported encoding for an ``Accept-Encoding`` header.
+
+    Returns None when the client accepts none of the available encodings,
+    in which case the body should be sent uncompressed.
+    """
+    if not accept_encoding:
+        return None
+    weights = _parse_accept_encoding(accept_encoding)
+    wildcard = weights.get("*", 0.0)
+    best: Optional[str] = None
+    best_q = 0.0
+    for encoding in PREFERENCE:
+        q = weights.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    return ENCODERS[encoding](data)
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    if not content_type:
+        return False
+    return content_type.lower().startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete responses above ``minimum_size``.
+
+    Only single-message bodies are compressed; streamed responses and
+    responses that already carry a ``Content-Encoding`` (e.g. precompressed
+    cache entries) pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = DEFAULT_MINIMUM_SIZE) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        encoding = negotiate_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[dict] = None
+        passthrough = False
+
+        async def send_wrapper(message) -> None:
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+            if passthrough:
+                await send(message)
+                return
+
+            response_headers: List[Tuple[bytes, bytes]] = list(start_message.get("headers", []))
+            header_map = {k.lower(): v for k, v in response_headers}
+            body = message.get("body", b"")
+            eligible = (
+                not message.get("more_body", False)
+                and b"content-encoding" not in header_map
+                and len(body) >= self.minimum_size
+                and is_compressible(header_map.get(b"content-type", b"").decode("latin-1"))
+            )
+            if not eligible:
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            response_headers = [
+                (k, v) for k, v in response_headers if k.lower() not in (b"content-length", b"vary")
+            ]
+            vary = header_map.get(b"vary")
+            if not vary:
+                vary = b"Accept-Encoding"
+            elif b"accept-encoding" not in vary.lower():
+                vary += b", Accept-Encoding"
+            response_headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(compressed)).encode("latin-1")),
+                (b"vary", vary),
+            ]
+            start_message["headers"] = response_headers
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,11 +1,35 @@
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional
 
-from sqlalchemy import func, select
+from pydantic import TypeAdapter
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from .models import Article, User, Vote
-from .schemas import VoteType
+from . import analytics, jobs, revisions
+from .cache import CachedPage, article_pages
+from .invalidation import bus
+from .models import Article, User, Vote, VoteRollup
+from .schemas import ArticleResponse, VoteType
+from .vote_index import vote_index
+
+article_list_adapter = TypeAdapter(List[ArticleResponse])
+
+# (skip, limit) pairs kept in the page cache: the full list, plus any pages
+# the bundled front-end requests (added by mount_frontend). Caching only
+# these means clients cycling through arbitrary values can't evict them.
+CACHED_PAGES = {(0, None)}
+
+# update_article retries when a concurrent edit took its revision number.
+REVISION_WRITE_ATTEMPTS = 3
+
+# Article writes publish "article" events on the invalidation bus; every
+# worker process (including the writer) drops its cached list pages.
+bus.subscribe("article", lambda _article_id: article_pages.invalidate())
+# Vote writers update their own vote index in place (publish(local=False));
+# other processes drop the user's entry and reload it on next use.
+bus.subscribe("user_votes", vote_index.invalidate)
+bus.subscribe("article_deleted", vote_index.discard_article)
 
 # Users
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
@@ -23,13 +47,26 @@ def create_user(db: Session, email: str, hashed_password: str) -> User:
 def create_article(db: Session, title: str, content: str, author_id: int) -> Article:
     article = Article(title=title, content=content, author_id=author_id)
     db.add(article)
+    db.flush()
+    revisions.record_revision(db, article, rev=1, editor_id=author_id)
+    bus.publish(db, "article", article.id)
     db.commit()
+    _schedule_warm(db)
     db.refresh(article)
     return article
 
 
-def get_articles_with_votes(db: Session, current_user_id: int) -> List[Dict[str, Any]]:
-    articles = db.execute(select(Article)).scalars().all()
+def get_articles_with_votes(
+        db: Session,
+        current_user_id: int,
+        skip: int = 0,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+    articles_q = select(Article).order_by(Article.id).offset(skip)
+    if limit is not None:
+        articles_q = articles_q.limit(limit)
+    articles = db.execute(articles_q).scalars().all()
+    user_votes = vote_index.get(db, current_user_id) if current_user_id else None
     result = []
     for article in articles:
         upvotes_q = (
@@ -52,27 +89,55 @@ def get_articles_with_votes(db: Session, current_user_id: int) -> List[Dict[str,
         )
         downvotes = db.execute(downvotes_q).scalar_one()
 
-        user_vote_q = (
-            select(Vote)
-            .where(
-                Vote.article_id == article.id,
-                Vote.user_id == current_user_id,
-            )
-        )
-        user_vote = db.execute(user_vote_q).scalars().first()
-        user_vote_type = user_vote.vote_type.value if user_vote else None
-
         result.append(
             {
                 **article.__dict__,
                 "upvotes": upvotes,
                 "downvotes": downvotes,
-                "user_vote": user_vote_type,
+                "user_vote": user_votes.vote_for(article.id) if user_votes else None,
             }
         )
     return result
 
 
+def get_anonymous_article_page(db: Session, skip: int = 0, limit: Optional[int] = None) -> CachedPage:
+    """Serialized article list as seen by anonymous users.
+
+    Pages listed in ``CACHED_PAGES`` are served from the page cache; any
+    other ``(skip, limit)`` is built per request.
+    """
+    def build() -> bytes:
+        return article_list_adapter.dump_json(
+            article_list_adapter.validate_python(get_articles_with_votes(db, 0, skip=skip, limit=limit))
+        )
+
+    if (skip, limit) not in CACHED_PAGES:
+        return CachedPage(build())
+    return article_pages.get_or_build((skip, limit), build)
+
+
+def get_article_page_for_user(
+        db: Session,
+        current_user_id: int,
+        skip: int = 0,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+    """Anonymous cached page with the user's votes overlaid from the vote index.
+
+    Costs no queries once the page and the user's votes are cached.
+    """
+    if (skip, limit) not in CACHED_PAGES:
+        return get_articles_with_votes(db, current_user_id, skip=skip, limit=limit)
+    rows = get_anonymous_article_page(db, skip=skip, limit=limit).rows()
+    user_votes = vote_index.get(db, current_user_id)
+    return [{**row, "user_vote": user_votes.vote_for(row["id"])} for row in rows]
+
+
+def _schedule_warm(db: Session) -> None:
+    # Rebuild the front page off the request path so the next reader hits cache.
+    jobs.enqueue(db, "warm_article_pages")
+
+
 def get_article_with_votes(
         db: Session,
         article_id: int,
@@ -102,15 +167,7 @@ def get_article_with_votes(
     )
     downvotes = db.execute(downvotes_q).scalar_one()
 
-    user_vote_q = (
-        select(Vote)
-        .where(
-            Vote.article_id == article.id,
-            Vote.user_id == current_user_id,
-        )
-    )
-    user_vote = db.execute(user_vote_q).scalars().first()
-    user_vote_type = user_vote.vote_type.value if user_vote else None
+    user_vote_type = vote_index.get(db, current_user_id).vote_for(article.id) if current_user_id else None
 
     return {
         **article.__dict__,
@@ -124,46 +181,128 @@ def update_article(
         db: Session,
         article_id: int,
         title: Optional[str],
-        content: Optional[str]
+        content: Optional[str],
+        editor_id: Optional[int] = None
     )-> Optional[Article]:
-    article_q = select(Article).where(Article.id == article_id)
-    article = db.execute(article_q).scalars().first()
+    # The row lock serializes concurrent edits where the backend supports it;
+    # elsewhere (SQLite) two edits can pick the same rev number, and the one
+    # that loses on the unique (article_id, rev) constraint is redone on top
+    # of the winner.
+    article_q = select(Article).where(Article.id == article_id).with_for_update()
+    for attempt in range(REVISION_WRITE_ATTEMPTS):
+        article = db.execute(article_q).scalars().first()
+        if not article:
+            return None
+        rev = revisions.latest_rev(db, article.id)
+        if rev == 0:
+            # Article predates revision history: keep its current state as rev 1.
+            revisions.record_revision(db, article, rev=1)
+            rev = 1
+        previous_content = article.content
+        if title is not None:
+            article.title = title
+        if content is not None:
+            article.content = content
+        article.updated_at = datetime.now(timezone.utc)
+        revisions.record_revision(db, article, rev=rev + 1, previous_content=previous_content, editor_id=editor_id)
+        bus.publish(db, "article", article.id)
+        try:
+            db.commit()
+            break
+        except IntegrityError:
+            db.rollback()
+            if attempt == REVISION_WRITE_ATTEMPTS - 1:
+                raise
+    _schedule_warm(db)
+    db.refresh(article)
+    return article
+
+
+def set_article_image(
+        db: Session,
+        article_id: int,
+        image_hash: str,
+        image_width: Optional[int]
+    ) -> Optional[Article]:
+    article = db.execute(select(Article).where(Article.id == article_id)).scalars().first()
     if not article:
         return None
-    if title is not None:
-        article.title = title
-    if content is not None:
-        article.content = content
-    article.updated_at = datetime.now(timezone.utc)
+    article.image_hash = image_hash
+    article.image_width = image_width
+    article.image_variants_ready = False
+    bus.publish(db, "article", article.id)
     db.commit()
+    _schedule_warm(db)
     db.refresh(article)
     return article
 
 
+def mark_image_variants_ready(db: Session, image_hash: str) -> int:
+    """Start advertising resized variants for every article using ``image_hash``."""
+    articles = db.execute(
+        select(Article).where(Article.image_hash == image_hash, Article.image_variants_ready.isnot(True))
+    ).scalars().all()
+    for article in articles:
+        article.image_variants_ready = True
+        bus.publish(db, "article", article.id)
+    db.commit()
+    if articles:
+        _schedule_warm(db)
+    return len(articles)
+
+
 def delete_article(db: Session, article_id: int) -> bool:
     article = db.execute(select(Article).where(Article.id == article_id)).scalars().first()
     if not article:
         return False
     db.delete(article)
+    db.execute(delete(VoteRollup).where(VoteRollup.article_id == article_id))
+    bus.publish(db, "article", article_id)
+    bus.publish(db, "article_deleted", article_id)
     db.commit()
+    _schedule_warm(db)
     return True
 
 # Votes
+def _record_vote_change(
+        db: Session,
+        article_id: int,
+        previous: Optional[VoteType],
+        current: Optional[VoteType]
+    ) -> None:
+    def count(vote_type: Optional[VoteType], kind: VoteType) -> int:
+        return 1 if vote_type == kind else 0
+
+    analytics.record_vote_delta(
+        db,
+        article_id,
+        upvotes=count(current, VoteType.UPVOTE) - count(previous, VoteType.UPVOTE),
+        downvotes=count(current, VoteType.DOWNVOTE) - count(previous, VoteType.DOWNVOTE),
+    )
+
+
 def get_user_vote(db: Session, article_id: int, user_id: int) -> Optional[Vote]:
     return db.execute(select(Vote).where(Vote.article_id == article_id, Vote.user_id == user_id)).scalars().first()
 
 
 def add_or_toggle_vote(db: Session, article_id: int, user_id: int, vote_type: VoteType) -> None:
     existing_vote = get_user_vote(db, article_id, user_id)
+    previous = existing_vote.vote_type if existing_vote else None
+    current: Optional[VoteType] = vote_type
     if existing_vote:
         if existing_vote.vote_type == vote_type:
             db.delete(existing_vote)
+            current = None
         else:
             existing_vote.vote_type = vote_type
     else:
         new_vote = Vote(user_id=user_id, article_id=article_id, vote_type=vote_type)
         db.add(new_vote)
+    _record_vote_change(db, article_id, previous, current)
+    bus.publish(db, "article", article_id)
+    bus.publish(db, "user_votes", user_id, local=False)
     db.commit()
+    vote_index.apply(user_id, article_id, current)
 
 
 def remove_vote(db: Session, article_id: int, user_id: int) -> bool:
@@ -171,5 +310,9 @@ def remove_vote(db: Session, article_id: int, user_id: int) -> bool:
     if not vote:
         return False
     db.delete(vote)
+    _record_vote_change(db, article_id, vote.vote_type, None)
+    bus.publish(db, "article", article_id)
+    bus.publish(db, "user_votes", user_id, local=False)
     db.commit()
+    vote_index.apply(user_id, article_id, None)
     return True
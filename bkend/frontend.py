@@ -0,0 +1,156 @@
+"""Optional serving of the static front-end from the FastAPI app.
+
+Enabled with ``BACKEND_SERVE_FRONTEND=1``. Assets (``script.js``,
+``styles.css`` and ``media/``) are read once at startup, renamed with a
+content hash and served under ``/assets/`` with ``Cache-Control: immutable``
+and precompressed variants. ``/`` serves ``index.html`` with hashed asset URLs
+and the first page of articles rendered inline, so first paint needs a single
+round trip.
+"""
+import hashlib
+import html
+import mimetypes
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy.orm import Session
+
+from .cache import CachedPage, CachedPageResponse, article_pages
+from .compression import available_encodings, is_compressible
+from .crud import CACHED_PAGES, get_articles_with_votes
+from .images import image_urls
+
+FRONTEND_DIR = Path(os.getenv("FRONTEND_DIR", Path(__file__).resolve().parent.parent))
+FIRST_PAGE_SIZE = int(os.getenv("FRONTEND_FIRST_PAGE_SIZE", "10"))
+ASSET_FILES = ("script.js", "styles.css")
+ASSET_DIRS = ("media",)
+
+IMMUTABLE = {"Cache-Control": "public, max-age=31536000, immutable"}
+REVALIDATE = {"Cache-Control": "no-cache"}
+
+
+def hashed_name(logical: str, body: bytes) -> str:
+    """``media/logo.png`` -> ``media/logo.<hash>.png``."""
+    digest = hashlib.sha256(body).hexdigest()[:12]
+    stem, dot, ext = logical.rpartition(".")
+    if not dot:
+        return f"{logical}.{digest}"
+    return f"{stem}.{digest}.{ext}"
+
+
+class AssetManifest:
+    """Content-hashed, precompressed copies of the front-end assets."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.urls: Dict[str, str] = {}
+        self.assets: Dict[str, CachedPage] = {}
+        for logical in self._logical_paths():
+            body = (root / logical).read_bytes()
+            media_type = mimetypes.guess_type(logical)[0] or "application/octet-stream"
+            if media_type.startswith("text/") or media_type == "application/javascript":
+                media_type += "; charset=utf-8"
+            page = CachedPage(body, media_type=media_type)
+            if is_compressible(media_type):
+                for encoding in available_encodings():
+                    page.encoded(encoding)
+            name = hashed_name(logical, body)
+            self.assets[name] = page
+            self.urls[logical] = f"/assets/{name}"
+
+    def _logical_paths(self) -> List[str]:
+        paths = [name for name in ASSET_FILES if (self.root / name).is_file()]
+        for dirname in ASSET_DIRS:
+            directory = self.root / dirname
+            if directory.is_dir():
+                paths += sorted(
+                    p.relative_to(self.root).as_posix() for p in directory.rglob("*") if p.is_file()
+                )
+        return paths
+
+    def rewrite(self, markup: str) -> str:
+        for logical, url in self.urls.items():
+            markup = markup.replace(f'"./{logical}"', f'"{url}"').replace(f'"{logical}"', f'"{url}"')
+        return markup
+
+
+def render_image(article: dict, fallback_url: Optional[str]) -> str:
+    urls = image_urls(article.get("image_hash"), article.get("image_width"), article.get("image_variants_ready"))
+    if urls is None:
+        if not fallback_url:
+            return ""
+        return f'<img src="{fallback_url}" alt="Satirical Image" loading="lazy" decoding="async">'
+    sources = "".join(
+        f'<source type="{s["type"]}" srcset="{s["srcset"]}" sizes="(max-width: 600px) 100vw, 600px">'
+        for s in urls["sources"]
+    )
+    img = f'<img src="{urls["src"]}" alt="Satirical Image" loading="lazy" decoding="async">'
+    return f"<picture>{sources}{img}</picture>"
+
+
+def render_article(article: dict, image_url: Optional[str]) -> str:
+    """Server-side counterpart of ``renderArticle`` in ``script.js``."""
+    created = article["created_at"]
+    date = created.date().isoformat() if hasattr(created, "date") else html.escape(str(created))
+    img = render_image(article, image_url)
+    return (
+        "<article>"
+        f"{img}"
+        '<span class="topic">satire</span>'
+        f'<span class="date">{date}</span>'
+        f"<h2>{html.escape(article['title'])}</h2>"
+        f"<p>{html.escape(article['content'])}</p>"
+        f'<div class="meta">Upvotes: {article["upvotes"]}  Downvotes: {article["downvotes"]}</div>'
+        "</article>"
+    )
+
+
+def render_index(
+        template: str,
+        manifest: AssetManifest,
+        articles: List[dict],
+        first_page_size: int = FIRST_PAGE_SIZE
+    ) -> str:
+    markup = manifest.rewrite(template)
+    image_url = manifest.urls.get("media/cfclasspic.png")
+    if articles:
+        inline = "".join(render_article(a, image_url) for a in articles)
+    else:
+        inline = "No articles available."
+    markup = markup.replace(
+        'id="articles-container"',
+        f'id="articles-container" data-prerendered="true" data-first-page-size="{first_page_size}"',
+    )
+    markup = markup.replace("<!-- Articles will be loaded here by script.js -->", inline)
+    # Same-origin API: script.js uses relative URLs when served from here.
+    return markup.replace('<body class="light-mode">', '<body class="light-mode" data-api-base="">')
+
+
+def mount_frontend(app: FastAPI, get_db, root: Path = FRONTEND_DIR) -> AssetManifest:
+    """Register ``/`` and ``/assets/{name}`` on ``app`` and return the manifest."""
+    manifest = AssetManifest(root)
+    template = (root / "index.html").read_text(encoding="utf-8")
+    # script.js fetches the articles after the inlined first page.
+    CACHED_PAGES.add((FIRST_PAGE_SIZE, None))
+
+    @app.get("/assets/{name:path}", include_in_schema=False)
+    def frontend_asset(name: str):
+        page = manifest.assets.get(name)
+        if page is None:
+            raise HTTPException(status_code=404, detail="Asset not found")
+        return CachedPageResponse(page, headers=IMMUTABLE)
+
+    @app.get("/", include_in_schema=False)
+    def frontend_index(db: Session = Depends(get_db)):
+        page = article_pages.get_or_build(
+            ("index", FIRST_PAGE_SIZE),
+            lambda: render_index(
+                template, manifest, get_articles_with_votes(db, 0, limit=FIRST_PAGE_SIZE), FIRST_PAGE_SIZE
+            ).encode("utf-8"),
+            media_type="text/html; charset=utf-8",
+        )
+        return CachedPageResponse(page, headers=REVALIDATE)
+
+    return manifest
@@ -0,0 +1,205 @@
+"""Article image storage and resized variant generation.
+
+Uploaded originals are stored content-addressed under ``IMAGE_DIR``
+(``<hash[:2]>/<hash>/original``). Resized variants (``<width>.<ext>``) are
+generated in a background process pool with Pillow, which is an optional
+dependency: without it only the original is stored and served. Pillow is
+imported on first use rather than at import time to keep startup fast.
+"""
+import functools
+import hashlib
+import importlib
+import io
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+IMAGE_DIR = Path(os.getenv("IMAGE_DIR", BASE_DIR / "images"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))
+
+# Target widths for srcset; the original width is always added as the largest.
+VARIANT_WIDTHS = (320, 640, 1024, 1600)
+
+# Pillow format name, file extension and MIME type, most efficient first.
+_FORMATS = (
+    ("AVIF", "avif", "image/avif"),
+    ("WEBP", "webp", "image/webp"),
+    ("JPEG", "jpg", "image/jpeg"),
+)
+_SAVE_OPTIONS: Dict[str, dict] = {
+    "AVIF": {"quality": 55},
+    "WEBP": {"quality": 75, "method": 4},
+    "JPEG": {"quality": 80, "optimize": True, "progressive": True},
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _pil():
+    """Return the ``PIL.Image`` module, or None when Pillow is not installed."""
+    try:  # optional dependency
+        return importlib.import_module("PIL.Image")
+    except ImportError:  # pragma: no cover - depends on environment
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def variant_formats() -> Tuple[Tuple[str, str, str], ...]:
+    """Output formats the installed Pillow can encode, most efficient first."""
+    if _pil() is None:
+        return ()
+    features = importlib.import_module("PIL.features")
+    supported = []
+    for fmt, ext, mime in _FORMATS:
+        if fmt == "JPEG" or features.check(fmt.lower()):
+            supported.append((fmt, ext, mime))
+    return tuple(supported)
+
+
+MIME_TYPES = {ext: mime for _, ext, mime in _FORMATS}
+
+
+def image_dir(image_hash: str, root: Optional[Path] = None) -> Path:
+    return (root or IMAGE_DIR) / image_hash[:2] / image_hash
+
+
+def variant_widths(original_width: Optional[int]) -> List[int]:
+    if not original_width:
+        return []
+    return [w for w in VARIANT_WIDTHS if w < original_width] + [original_width]
+
+
+def image_urls(
+        image_hash: Optional[str],
+        original_width: Optional[int],
+        variants_ready: Optional[bool] = False
+    ) -> Optional[dict]:
+    """Build ``src`` plus per-format ``srcset`` strings for an article image.
+
+    ``sources`` stays empty until the variants have been generated: browsers
+    don't fall back from a failing ``<source>`` to the ``<img>`` src.
+    """
+    if not image_hash:
+        return None
+    base = f"/images/{image_hash}"
+    widths = variant_widths(original_width) if variants_ready else []
+    sources = [
+        {"type": mime, "srcset": ", ".join(f"{base}/{w}.{ext} {w}w" for w in widths)}
+        for _, ext, mime in variant_formats()
+        if widths
+    ]
+    return {"src": f"{base}/original", "width": original_width, "sources": sources}
+
+
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", 0, "image/png"),
+    (b"\xff\xd8\xff", 0, "image/jpeg"),
+    (b"GIF8", 0, "image/gif"),
+    (b"WEBP", 8, "image/webp"),
+    (b"ftypavif", 4, "image/avif"),
+)
+
+
+def sniff_mime(data: bytes) -> Optional[str]:
+    """Identify a supported image type from its leading bytes."""
+    for signature, offset, mime in _SIGNATURES:
+        if data[offset:offset + len(signature)] == signature:
+            return mime
+    return None
+
+
+def store_original(data: bytes, root: Optional[Path] = None) -> Tuple[str, Path]:
+    """Write ``data`` under its sha256 unless already present; return hash and path."""
+    image_hash = hashlib.sha256(data).hexdigest()
+    directory = image_dir(image_hash, root)
+    path = directory / "original"
+    if not path.exists():
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp = directory / f".original.{os.getpid()}.tmp"
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    return image_hash, path
+
+
+# EXIF orientations that rotate by 90/270 degrees (display width = stored height).
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+_EXIF_ORIENTATION = 0x0112
+
+
+def probe_width(data: bytes) -> Optional[int]:
+    """Return the displayed pixel width of an image, or None if it cannot be decoded.
+
+    Pillow only parses the header here, so this is cheap enough to run inline.
+    The EXIF orientation is honoured the same way ``ImageOps.exif_transpose``
+    applies it in ``generate_variants``, without decoding the pixels.
+    """
+    Image = _pil()
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as im:
+            if im.getexif().get(_EXIF_ORIENTATION) in _TRANSPOSED_ORIENTATIONS:
+                return im.height
+            return im.width
+    except Exception:
+        return None
+
+
+def generate_variants(original: str, widths: Sequence[int], formats: Sequence[Tuple[str, str, str]]) -> List[str]:
+    """Resize and re-encode ``original`` into every width/format pair.
+
+    Runs inside a worker process. Existing variants are kept, so retries and
+    duplicate uploads of the same content are cheap.
+    """
+    Image = _pil()
+    ImageOps = importlib.import_module("PIL.ImageOps")
+    directory = Path(original).parent
+    written = []
+    with Image.open(original) as stored:
+        # Bake the EXIF orientation into the pixels: variants carry no EXIF.
+        im = ImageOps.exif_transpose(stored)
+        for fmt, ext, _ in formats:
+            source = im.convert("RGB") if fmt == "JPEG" and im.mode not in ("RGB", "L") else im
+            for width in widths:
+                target = directory / f"{width}.{ext}"
+                if target.exists():
+                    continue
+                height = max(1, round(source.height * width / source.width))
+                resized = source if width == source.width else source.resize((width, height), Image.LANCZOS)
+                tmp = directory / f".{width}.{ext}.{os.getpid()}.tmp"
+                resized.save(tmp, format=fmt, **_SAVE_OPTIONS[fmt])
+                os.replace(tmp, target)
+                written.append(target.name)
+    return written
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # The pool is created from a job-worker thread while other threads
+        # (tailer, job workers, the request threadpool) run; forking then can
+        # leave locks held in the child, so start workers with spawn.
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def schedule_variants(path: Path, original_width: Optional[int]) -> Optional[Future]:
+    """Queue variant generation for ``path`` on the process pool."""
+    widths = variant_widths(original_width)
+    formats = variant_formats()
+    if not widths or not formats:
+        return None
+    return _get_executor().submit(generate_variants, str(path), widths, formats)
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,151 @@
+"""Cross-process cache invalidation through a database-backed change log.
+
+Writers call :meth:`InvalidationBus.publish` inside their transaction; this
+adds a ``cache_events`` row, so the event commits (or rolls back) atomically
+with the write. Once the session commits, handlers in the writing process run
+immediately. Every other worker process runs a :class:`ChangeLogTailer` that
+polls for rows newer than the last one it saw and runs the same handlers, so
+in-process caches stay coherent across uvicorn workers without a network
+service — a local stand-in for Redis pub/sub. Rows carry the writing
+process's ``origin`` so a tailer skips events already delivered locally.
+"""
+import logging
+import os
+import threading
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, DefaultDict, List, Optional, Tuple
+
+from sqlalchemy import delete, event, func, select
+from sqlalchemy.orm import Session
+
+from .models import CacheEvent
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Optional[int]], None]
+
+_PENDING_KEY = "pending_invalidations"
+_origin_cache: Tuple[int, str] = (0, "")
+
+
+def process_origin() -> str:
+    """Token identifying this process; regenerated after a fork."""
+    global _origin_cache
+    pid = os.getpid()
+    if _origin_cache[0] != pid:
+        _origin_cache = (pid, uuid.uuid4().hex)
+    return _origin_cache[1]
+
+
+class InvalidationBus:
+    def __init__(self) -> None:
+        self._handlers: DefaultDict[str, List[Handler]] = defaultdict(list)
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        """Call ``handler(key)`` for every event on ``topic``, local or remote."""
+        self._handlers[topic].append(handler)
+
+    def unsubscribe(self, topic: str, handler: Handler) -> None:
+        """Stop calling a handler registered with :meth:`subscribe`."""
+        self._handlers[topic].remove(handler)
+
+    def publish(self, db: Session, topic: str, key: Optional[int] = None, local: bool = True) -> None:
+        """Record an event in ``db``'s transaction; delivered once it commits.
+
+        Pass ``local=False`` when the writer updates its own cache in place
+        and only other processes need to react.
+        """
+        db.add(CacheEvent(topic=topic, key=key, origin=process_origin(), created_at=datetime.now(timezone.utc)))
+        if local:
+            db.info.setdefault(_PENDING_KEY, []).append((topic, key))
+
+    def dispatch(self, topic: str, key: Optional[int]) -> None:
+        for handler in self._handlers.get(topic, ()):
+            try:
+                handler(key)
+            except Exception:
+                logger.exception("Invalidation handler failed for %s:%s", topic, key)
+
+
+bus = InvalidationBus()
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver_local(session: Session) -> None:
+    pending: List[Tuple[str, Optional[int]]] = session.info.pop(_PENDING_KEY, [])
+    for topic, key in pending:
+        bus.dispatch(topic, key)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_local(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+class ChangeLogTailer:
+    """Background thread replaying change-log rows written by other processes."""
+
+    def __init__(
+            self,
+            session_factory,
+            poll_interval: float = 0.1,
+            retention: timedelta = timedelta(hours=1),
+            target: InvalidationBus = bus
+        ) -> None:
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.bus = target
+        self.last_id = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        with self.session_factory() as db:
+            # Caches start empty, so history before startup is irrelevant.
+            self.last_id = db.execute(select(func.max(CacheEvent.id))).scalar_one() or 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="invalidation-tailer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def poll(self) -> int:
+        """Apply other processes' events newer than ``last_id``; returns how many."""
+        origin = process_origin()
+        with self.session_factory() as db:
+            rows = db.execute(
+                select(CacheEvent.id, CacheEvent.topic, CacheEvent.key, CacheEvent.origin)
+                .where(CacheEvent.id > self.last_id)
+                .order_by(CacheEvent.id)
+            ).all()
+        applied = 0
+        for row in rows:
+            if row.origin != origin:
+                self.bus.dispatch(row.topic, row.key)
+                applied += 1
+            self.last_id = row.id
+        return applied
+
+    def prune(self) -> None:
+        cutoff = datetime.now(timezone.utc) - self.retention
+        with self.session_factory() as db:
+            db.execute(delete(CacheEvent).where(CacheEvent.created_at < cutoff))
+            db.commit()
+
+    def _loop(self) -> None:
+        polls = 0
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+                polls += 1
+                if polls % 6000 == 0:
+                    self.prune()
+            except Exception:
+                logger.exception("Invalidation tailer poll failed")
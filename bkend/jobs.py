@@ -0,0 +1,266 @@
+"""Small durable job queue for work that should not run on the request path.
+
+Jobs are rows in the ``jobs`` table, so they survive restarts. Handlers are
+registered with :func:`job` and executed by a :class:`JobWorker` thread pool
+that claims rows with a lease (``locked_until``); a job whose worker died is
+picked up again once its lease expires. Failures are retried with exponential
+backoff up to ``max_attempts``. An ``idempotency_key`` makes enqueueing the
+same logical job more than once a no-op.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Deque, Dict, Optional
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+LEASE_SECONDS = 300
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 600.0
+RETENTION = timedelta(hours=24)
+
+Handler = Callable[[Session, Dict[str, Any]], None]
+HANDLERS: Dict[str, Handler] = {}
+
+# Set on enqueue so idle in-process workers pick new jobs up immediately
+# instead of waiting for the next poll.
+_wakeup = threading.Event()
+
+
+def _now() -> datetime:
+    # SQLite DateTime columns round-trip naive values; store naive UTC so
+    # values read back compare cleanly with this clock.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def job(kind: str) -> Callable[[Handler], Handler]:
+    """Register ``fn(db, payload)`` as the handler for jobs of ``kind``."""
+    def decorator(fn: Handler) -> Handler:
+        HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+
+def enqueue(
+        db: Session,
+        kind: str,
+        payload: Optional[Dict[str, Any]] = None,
+        idempotency_key: Optional[str] = None,
+        delay: float = 0,
+        max_attempts: int = 5,
+        retry_failed: bool = False
+    ) -> Job:
+    """Persist a job and commit. Call after the triggering write has committed.
+
+    With ``retry_failed``, a FAILED job under the same ``idempotency_key`` is
+    reset to run again instead of being returned as-is.
+    """
+    if idempotency_key is not None:
+        existing = db.execute(select(Job).where(Job.idempotency_key == idempotency_key)).scalars().first()
+        if existing is not None and retry_failed and existing.status == FAILED:
+            existing.status = PENDING
+            existing.attempts = 0
+            existing.max_attempts = max_attempts
+            existing.payload = json.dumps(payload or {})
+            existing.run_at = _now() + timedelta(seconds=delay)
+            existing.last_error = None
+            existing.finished_at = None
+            db.commit()
+            _wakeup.set()
+            return existing
+        if existing is not None:
+            return existing
+    new_job = Job(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        idempotency_key=idempotency_key,
+        status=PENDING,
+        max_attempts=max_attempts,
+        run_at=_now() + timedelta(seconds=delay),
+        created_at=_now(),
+    )
+    db.add(new_job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost a race with another enqueue of the same key.
+        db.rollback()
+        return db.execute(select(Job).where(Job.idempotency_key == idempotency_key)).scalars().one()
+    _wakeup.set()
+    return new_job
+
+
+def backoff(attempts: int) -> float:
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim_next(db: Session) -> Optional[Job]:
+    """Atomically lease the next runnable job, or return None."""
+    now = _now()
+    runnable = or_(
+        (Job.status == PENDING) & (Job.run_at <= now),
+        (Job.status == RUNNING) & (Job.locked_until < now),
+    )
+    while True:
+        candidate = db.execute(
+            select(Job.id, Job.attempts).where(runnable).order_by(Job.run_at, Job.id).limit(1)
+        ).first()
+        if candidate is None:
+            return None
+        # Compare-and-set on attempts so two workers never claim the same row.
+        result = db.execute(
+            update(Job)
+            .where(Job.id == candidate.id, Job.attempts == candidate.attempts, runnable)
+            .values(
+                status=RUNNING,
+                attempts=Job.attempts + 1,
+                locked_until=now + timedelta(seconds=LEASE_SECONDS),
+            )
+        )
+        db.commit()
+        if result.rowcount == 1:
+            return db.get(Job, candidate.id, populate_existing=True)
+
+
+def run_job(db: Session, claimed: Job) -> bool:
+    """Execute a claimed job and record the outcome. Returns True on success."""
+    handler = HANDLERS.get(claimed.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind {claimed.kind!r}")
+        handler(db, json.loads(claimed.payload))
+    except Exception as exc:
+        db.rollback()
+        logger.exception("Job %s (%s) failed on attempt %s", claimed.id, claimed.kind, claimed.attempts)
+        claimed.last_error = f"{type(exc).__name__}: {exc}"
+        claimed.locked_until = None
+        if claimed.attempts >= claimed.max_attempts:
+            claimed.status = FAILED
+            claimed.finished_at = _now()
+        else:
+            claimed.status = PENDING
+            claimed.run_at = _now() + timedelta(seconds=backoff(claimed.attempts))
+        db.commit()
+        return False
+    claimed.status = DONE
+    claimed.locked_until = None
+    claimed.finished_at = _now()
+    db.commit()
+    return True
+
+
+def queue_stats(db: Session) -> Dict[str, Any]:
+    counts = dict(db.execute(select(Job.status, func.count()).group_by(Job.status)).all())
+    oldest = db.execute(select(func.min(Job.run_at)).where(Job.status == PENDING)).scalar_one()
+    return {
+        "depth": counts.get(PENDING, 0) + counts.get(RUNNING, 0),
+        "by_status": {s: counts.get(s, 0) for s in (PENDING, RUNNING, DONE, FAILED)},
+        "oldest_pending_age_seconds": max(0.0, (_now() - oldest).total_seconds()) if oldest else 0.0,
+    }
+
+
+def purge_finished(db: Session, older_than: timedelta = RETENTION) -> int:
+    result = db.execute(delete(Job).where(Job.status == DONE, Job.finished_at < _now() - older_than))
+    db.commit()
+    return result.rowcount
+
+
+class JobWorker:
+    """Pool of threads draining the queue through ``session_factory``."""
+
+    def __init__(self, session_factory, concurrency: int = 2, poll_interval: float = 1.0) -> None:
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads: list = []
+        self._lock = threading.Lock()
+        # Recent (queue latency, run time) samples in seconds.
+        self._latencies: Deque[tuple] = deque(maxlen=1000)
+        self.processed = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        self._stop.clear()
+        for i in range(self.concurrency):
+            t = threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        _wakeup.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads.clear()
+
+    def run_once(self) -> bool:
+        """Claim and run a single job. Returns False when nothing was runnable."""
+        with self.session_factory() as db:
+            claimed = claim_next(db)
+            if claimed is None:
+                return False
+            queued_for = (_now() - claimed.run_at).total_seconds()
+            started = time.perf_counter()
+            ok = run_job(db, claimed)
+            elapsed = time.perf_counter() - started
+        with self._lock:
+            self._latencies.append((queued_for, elapsed))
+            self.processed += 1
+            if not ok:
+                self.failed += 1
+        return True
+
+    def _loop(self) -> None:
+        last_purge = 0.0
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+                if time.monotonic() - last_purge > 3600:
+                    with self.session_factory() as db:
+                        purge_finished(db)
+                    last_purge = time.monotonic()
+            except Exception:
+                logger.exception("Job worker loop error")
+            _wakeup.wait(self.poll_interval)
+            _wakeup.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = list(self._latencies)
+            processed, failed = self.processed, self.failed
+
+        def pct(values, q):
+            if not values:
+                return 0.0
+            values = sorted(values)
+            return values[min(len(values) - 1, int(q * len(values)))]
+
+        queued = [s[0] for s in samples]
+        runs = [s[1] for s in samples]
+        return {
+            "workers": len(self._threads),
+            "processed": processed,
+            "failed": failed,
+            "queue_latency_p50_seconds": pct(queued, 0.5),
+            "queue_latency_p95_seconds": pct(queued, 0.95),
+            "run_time_p50_seconds": pct(runs, 0.5),
+            "run_time_p95_seconds": pct(runs, 0.95),
+        }
@@ -1,26 +1,34 @@
 import os
 import hashlib
-from datetime import datetime, timedelta
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, List, Optional
 
-from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi import Depends, FastAPI, File, HTTPException, Query, Request, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from sqlalchemy import func, select
 from sqlalchemy.orm import Session, sessionmaker
 
-from . import schemas
+from . import analytics, images, jobs, profiling, revisions, schemas, tasks  # noqa: F401 (tasks registers job handlers)
+from .invalidation import ChangeLogTailer
+from .cache import CachedPageResponse
+from .compression import CompressionMiddleware
+from .frontend import mount_frontend
 from .crud import (
     add_or_toggle_vote,
     create_article as crud_create_article,
     create_user,
     delete_article as crud_delete_article,
+    get_anonymous_article_page,
+    get_article_page_for_user,
     get_article_with_votes,
-    get_articles_with_votes,
     get_user_by_email,
+    mark_image_variants_ready,
     remove_vote as crud_remove_vote,
+    set_article_image,
     update_article as crud_update_article,
 )
 from .models import Article, User, Vote, engine, init_db
@@ -34,16 +42,56 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 # Database setup
 # SessionLocal is a simple factory returning SQLAlchemy Session instances
 SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, class_=Session)
-init_db()
+# Schema creation/migration runs in the lifespan handler, not at import, so
+# importing this module (uvicorn worker spawn, test collection) stays cheap.
+# Set BACKEND_INIT_DB=0 when migrations are run separately
+# (python -m bkend.scripts.migrate).
+INIT_DB_ON_STARTUP = os.getenv("BACKEND_INIT_DB", "1") == "1"
 
 # Security
 # Use PBKDF2-SHA256 to avoid relying on bcrypt's 72-byte input limit and
 # environment-dependent bcrypt backends. PBKDF2-SHA256 is widely supported by
-# passlib and doesn't impose the 72-byte restriction.
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# passlib and doesn't impose the 72-byte restriction. passlib and python-jose
+# are imported on first use to keep them out of the import-time path.
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-app = FastAPI(title="Article Voting System")
+# Background jobs: JOB_WORKERS threads drain the durable queue; 0 disables
+# them (e.g. when a separate process runs the worker).
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+job_worker = jobs.JobWorker(SessionLocal, concurrency=JOB_WORKERS)
+
+# Replays cache invalidations written by other worker processes (see
+# bkend.serve for the multi-worker entry point).
+INVALIDATION_POLL_INTERVAL = float(os.getenv("BACKEND_INVALIDATION_POLL_INTERVAL", "0.1"))
+invalidation_tailer = ChangeLogTailer(SessionLocal, poll_interval=INVALIDATION_POLL_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    if INIT_DB_ON_STARTUP:
+        init_db()
+    with SessionLocal() as db:
+        tasks.schedule_rollup_compaction(db)
+    invalidation_tailer.start()
+    job_worker.start()
+    try:
+        yield
+    finally:
+        job_worker.stop()
+        invalidation_tailer.stop()
+        images.shutdown()
+
+
+app = FastAPI(title="Article Voting System", lifespan=lifespan)
+# Sync endpoints are registered through profiling.traced so an admin can
+# cProfile live requests (see /admin/profile/requests); a no-op when unarmed.
+app.router.route_class = profiling.TracedRoute
 
 # CORS configuration
 # Allow origins configured via BACKEND_CORS_ORIGINS env var as a comma-separated
@@ -62,6 +110,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compression of JSON/text bodies, negotiated per request. Article list pages
+# served from the page cache arrive already encoded and are passed through.
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(profiling.RequestTraceMiddleware)
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -70,6 +123,11 @@ def get_db():
     finally:
         db.close()
 
+# Front-end (index.html + hashed static assets), opt-in for single-origin
+# deployments. Registered after get_db exists since the index inlines articles.
+if os.getenv("BACKEND_SERVE_FRONTEND", "0") == "1":
+    mount_frontend(app, get_db)
+
 # Helper functions
 def verify_password(plain_password, hashed_password):
     # As an extra defensive measure we compute a SHA-256 hex digest of the
@@ -82,7 +140,7 @@ def verify_password(plain_password, hashed_password):
     else:
         plain_bytes = plain_password
     sha_hex = hashlib.sha256(plain_bytes).hexdigest()
-    return pwd_context.verify(sha_hex, hashed_password)
+    return get_pwd_context().verify(sha_hex, hashed_password)
 
 
 def get_password_hash(password):
@@ -94,10 +152,11 @@ def get_password_hash(password):
     else:
         pw_bytes = password
     sha_hex = hashlib.sha256(pw_bytes).hexdigest()
-    return pwd_context.hash(sha_hex)
+    return get_pwd_context().hash(sha_hex)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    from jose import jwt
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -109,6 +168,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    from jose import JWTError, jwt
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -196,6 +256,83 @@ def list_all_users(current_user: User = Depends(get_admin_user), db: Session = D
     return users
 
 
+@app.get("/admin/jobs")
+def job_queue_stats(current_user: User = Depends(get_admin_user), db: Session = Depends(get_db)):
+    """Admin-only: queue depth and recent job latency"""
+    return {**jobs.queue_stats(db), **job_worker.stats()}
+
+
+@app.get("/admin/analytics/articles/{article_id}/votes", response_model=List[schemas.VoteBucketResponse])
+def article_vote_series(
+    article_id: int,
+    granularity: schemas.RollupGranularity = schemas.RollupGranularity.HOUR,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Admin-only: net votes per bucket, answered from rollups (default: last 24h)"""
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(hours=24)
+    return analytics.vote_series(db, article_id, granularity, start, end)
+
+
+@app.get("/admin/analytics/trending", response_model=List[schemas.TrendingArticleResponse])
+def trending_articles(
+    hours: Annotated[int, Query(ge=1, le=24 * 90)] = 24,
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+    current_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Admin-only: articles with the most net upvotes over the last `hours`"""
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    return analytics.trending(db, since, limit=limit)
+
+
+def _profile_response(profile: profiling.Profile, fmt: schemas.ProfileFormat):
+    if fmt == schemas.ProfileFormat.SPEEDSCOPE:
+        return profile.speedscope()
+    return PlainTextResponse(profile.collapsed())
+
+
+@app.post("/admin/profile/sample")
+def profile_sample(
+    seconds: Annotated[float, Query(gt=0)] = 5.0,
+    interval_ms: Annotated[float, Query(ge=1, le=1000)] = 10.0,
+    format: schemas.ProfileFormat = schemas.ProfileFormat.COLLAPSED,
+    include_idle: bool = False,
+    current_user: User = Depends(get_admin_user)
+):
+    """Admin-only: sample all worker threads for `seconds` (capped by PROFILE_MAX_SECONDS)"""
+    try:
+        profile = profiling.sample(seconds, interval=interval_ms / 1000, include_idle=include_idle)
+    except profiling.ProfilerBusy as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    return _profile_response(profile, format)
+
+
+@app.post("/admin/profile/requests")
+def profile_requests(
+    seconds: Annotated[float, Query(gt=0)] = 10.0,
+    path_prefix: str = "/articles",
+    max_requests: Annotated[int, Query(ge=1, le=1000)] = 100,
+    format: schemas.ProfileFormat = schemas.ProfileFormat.COLLAPSED,
+    current_user: User = Depends(get_admin_user)
+):
+    """Admin-only: cProfile endpoints of requests under `path_prefix` for up to `seconds`
+
+    Only the endpoint function body is traced. Dependency resolution (token
+    decoding, user lookup, `get_db`) and `response_model` validation and
+    serialization run outside it; use `/admin/profile/sample` while the
+    requests run to see those.
+    """
+    try:
+        profile = profiling.request_tracer.capture(seconds, path_prefix=path_prefix, max_requests=max_requests)
+    except profiling.ProfilerBusy as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    return _profile_response(profile, format)
+
+
 @app.post("/articles", response_model=schemas.ArticleResponse, status_code=status.HTTP_201_CREATED)
 def create_article(
     article: schemas.ArticleCreate,
@@ -213,25 +350,63 @@ def create_article(
 @app.get("/articles", response_model=List[schemas.ArticleResponse])
 def get_articles(
     current_user: Optional[User] = Depends(optional_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    skip: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[Optional[int], Query(ge=1, le=100)] = None,
 ):
-    user_id = current_user.id if current_user is not None else 0
-    return get_articles_with_votes(db, user_id)
+    if current_user is not None:
+        return get_article_page_for_user(db, current_user.id, skip=skip, limit=limit)
+    # Anonymous pages carry no user_vote, so they are identical for every
+    # caller: serialize once and reuse the bytes (and compressed variants).
+    return CachedPageResponse(get_anonymous_article_page(db, skip=skip, limit=limit))
 
 
 @app.get("/articles/{article_id}", response_model=schemas.ArticleResponse)
 def get_article(
     article_id: int,
     current_user: Optional[User] = Depends(optional_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    rev: Annotated[Optional[int], Query(ge=1)] = None,
 ):
+    if rev is not None:
+        # Past versions are part of the admin-only edit history.
+        if current_user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Not authenticated",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        if not current_user.is_admin:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin status required")
     user_id = current_user.id if current_user is not None else 0
     article = get_article_with_votes(db, article_id, user_id)
     if not article:
         raise HTTPException(status_code=404, detail="Article not found")
+    if rev is not None:
+        revision = revisions.get_revision(db, article_id, rev)
+        if revision is None:
+            raise HTTPException(status_code=404, detail="Revision not found")
+        article = {
+            **article,
+            "title": revision["title"],
+            "content": revision["content"],
+            "updated_at": revision["created_at"],
+        }
     return article
 
 
+@app.get("/articles/{article_id}/revisions", response_model=List[schemas.ArticleRevisionResponse])
+def get_article_revisions(
+    article_id: int,
+    current_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Admin-only: edit history of an article, oldest first"""
+    if not db.execute(select(Article.id).where(Article.id == article_id)).first():
+        raise HTTPException(status_code=404, detail="Article not found")
+    return revisions.list_revisions(db, article_id)
+
+
 @app.put("/articles/{article_id}", response_model=schemas.ArticleResponse)
 def update_article(
     article_id: int,
@@ -243,7 +418,8 @@ def update_article(
         db,
         article_id=article_id,
         title=article_update.title,
-        content=article_update.content
+        content=article_update.content,
+        editor_id=_current_user.id
     )
     if not db_article:
         raise HTTPException(status_code=404, detail="Article not found")
@@ -296,3 +472,60 @@ def remove_vote(
     if not ok:
         raise HTTPException(status_code=404, detail="Vote not found")
     return {"message": "Vote removed successfully"}
+
+
+@app.post("/articles/{article_id}/image", response_model=schemas.ArticleResponse, status_code=status.HTTP_202_ACCEPTED)
+def upload_article_image(
+    article_id: int,
+    file: UploadFile = File(...),
+    _current_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Admin-only: attach an image; resized variants are generated in the background."""
+    data = file.file.read(images.MAX_IMAGE_BYTES + 1)
+    if len(data) > images.MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Image too large")
+    if images.sniff_mime(data) is None:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Unsupported image type")
+    if not db.execute(select(Article.id).where(Article.id == article_id)).first():
+        raise HTTPException(status_code=404, detail="Article not found")
+    image_hash, path = images.store_original(data)
+    width = images.probe_width(data)
+    db_article = set_article_image(db, article_id=article_id, image_hash=image_hash, image_width=width)
+    variants_job = jobs.enqueue(
+        db,
+        "image_variants",
+        {"image_hash": image_hash, "width": width},
+        idempotency_key=f"image_variants:{image_hash}",
+        retry_failed=True,
+    )
+    if variants_job.status == jobs.DONE:
+        # Same content uploaded before: its variants already exist.
+        mark_image_variants_ready(db, image_hash)
+    return get_article_with_votes(db, db_article.id, 0)
+
+
+@app.get("/images/{image_hash}/{variant}", include_in_schema=False)
+def get_image(image_hash: str, variant: str):
+    """Serve an original or resized variant; supports HTTP Range requests."""
+    if len(image_hash) != 64 or not all(c in "0123456789abcdef" for c in image_hash):
+        raise HTTPException(status_code=404, detail="Image not found")
+    if variant == "original":
+        media_type = None
+    else:
+        width, _, ext = variant.partition(".")
+        media_type = images.MIME_TYPES.get(ext)
+        if not width.isdigit() or media_type is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+    path = images.image_dir(image_hash) / variant
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Image not found")
+    if media_type is None:
+        with path.open("rb") as fh:
+            media_type = images.sniff_mime(fh.read(16)) or "application/octet-stream"
+    # Content-addressed URLs never change meaning, so they can be cached forever.
+    return FileResponse(
+        path,
+        media_type=media_type,
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
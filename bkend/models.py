@@ -3,7 +3,21 @@ from pathlib import Path
 from typing import List, Optional
 import os
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, String, create_engine
+from sqlalchemy import (
+    Boolean,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    UniqueConstraint,
+    create_engine,
+    event,
+    inspect,
+    text,
+)
 from sqlalchemy import Enum as SQLEnum
 from sqlalchemy.orm import Mapped, Session, declarative_base, mapped_column, relationship
 
@@ -21,6 +35,27 @@ engine = create_engine(
     future=True,
 )
 SessionLocal = Session
+
+
+def utcnow() -> datetime:
+    # Used as a column default: SQLAlchemy calls it for every row. Passing
+    # datetime.now(...) itself would freeze the import-time value.
+    return datetime.now(timezone.utc)
+
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, _record):
+        # Several worker processes share the file: WAL lets readers proceed
+        # during a write, and busy_timeout waits for the write lock instead
+        # of failing immediately with "database is locked".
+        cursor = dbapi_connection.cursor()
+        if DATABASE_URL not in ("sqlite://", "sqlite:///:memory:"):
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
+
 Base = declarative_base()
 
 
@@ -30,7 +65,7 @@ class User(Base):
     email: Mapped[str] = mapped_column(String, unique=True, index=True, nullable=False)
     hashed_password: Mapped[str] = mapped_column(String, nullable=False)
     is_admin: Mapped[bool] = mapped_column(Boolean, default=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now(timezone.utc))
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow)
     votes: Mapped[List["Vote"]] = relationship(
         "Vote",
         back_populates="user",
@@ -43,11 +78,15 @@ class Article(Base):
     title: Mapped[str] = mapped_column(String, nullable=False)
     content: Mapped[str] = mapped_column(String, nullable=False)
     author_id: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id"))
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now(timezone.utc))
+    image_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    image_width: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    # Set by the image_variants job once the resized variants exist on disk.
+    image_variants_ready: Mapped[Optional[bool]] = mapped_column(Boolean, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow)
     updated_at: Mapped[datetime] = mapped_column(
         DateTime,
-        default=datetime.now(timezone.utc),
-        onupdate=datetime.now(timezone.utc),
+        default=utcnow,
+        onupdate=utcnow,
     )
     author: Mapped[Optional[User]] = relationship("User")
     votes: Mapped[List["Vote"]] = relationship(
@@ -55,6 +94,10 @@ class Article(Base):
         back_populates="article",
         cascade="all, delete-orphan",
     )
+    revisions: Mapped[List["ArticleRevision"]] = relationship(
+        "ArticleRevision",
+        cascade="all, delete-orphan",
+    )
 
 
 class Vote(Base):
@@ -66,13 +109,89 @@ class Vote(Base):
         SQLEnum(VoteType),
         nullable=False,
     )
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now(timezone.utc))
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow)
     user: Mapped[User] = relationship("User", back_populates="votes")
     article: Mapped[Article] = relationship("Article", back_populates="votes")
 
 
+class ArticleRevision(Base):
+    """One edit of an article; ``data`` is a compressed snapshot or delta (see ``bkend.revisions``)."""
+    __tablename__ = "article_revisions"
+    __table_args__ = (UniqueConstraint("article_id", "rev"),)
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    article_id: Mapped[int] = mapped_column(ForeignKey("articles.id"), nullable=False, index=True)
+    rev: Mapped[int] = mapped_column(Integer, nullable=False)
+    title: Mapped[str] = mapped_column(String, nullable=False)
+    is_snapshot: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    editor_id: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id"), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow)
+
+
+class VoteRollup(Base):
+    """Net vote change per article per time bucket; see ``bkend.analytics``."""
+    __tablename__ = "vote_rollups"
+    # Trending queries scan one granularity over a time window across articles.
+    __table_args__ = (Index("ix_vote_rollups_window", "granularity", "bucket_start"),)
+    article_id: Mapped[int] = mapped_column(ForeignKey("articles.id"), primary_key=True)
+    granularity: Mapped[str] = mapped_column(String(8), primary_key=True)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    upvotes: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    downvotes: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class Job(Base):
+    """Durable deferred-work item; see ``bkend.jobs``."""
+    __tablename__ = "jobs"
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    kind: Mapped[str] = mapped_column(String, nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False, default="{}")
+    idempotency_key: Mapped[Optional[str]] = mapped_column(String, unique=True, nullable=True)
+    status: Mapped[str] = mapped_column(String, nullable=False, default="pending", index=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=5)
+    run_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class CacheEvent(Base):
+    """Change-log row tailed by every worker; see ``bkend.invalidation``."""
+    __tablename__ = "cache_events"
+    # AUTOINCREMENT keeps ids monotonic even after pruning empties the table,
+    # which tailers rely on to resume from the last id they saw.
+    __table_args__ = {"sqlite_autoincrement": True}
+    id: Mapped[int] = mapped_column(primary_key=True)
+    topic: Mapped[str] = mapped_column(String, nullable=False)
+    key: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    origin: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, index=True)
+
+
 def init_db(base=None, engine_override=None):
     """Initialize DB tables. Pass a specific Base or engine_override for tests if needed."""
     base = base or Base
     eng = engine_override or engine
     base.metadata.create_all(bind=eng)
+    add_missing_columns(base, eng)
+
+
+def add_missing_columns(base=None, eng=None):
+    """Add nullable columns introduced after a table was first created.
+
+    ``create_all`` never alters existing tables, so databases created by an
+    older version (e.g. the bundled articles.db) would otherwise miss them.
+    """
+    base = base or Base
+    eng = eng or engine
+    inspector = inspect(eng)
+    with eng.begin() as conn:
+        for table in base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                col_type = column.type.compile(dialect=eng.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}'))
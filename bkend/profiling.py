@@ -0,0 +1,394 @@
+"""On-demand profiling of a live worker.
+
+Two capture modes, both admin-triggered and time-boxed:
+
+* ``sample`` walks every thread's stack (``sys._current_frames``) at a fixed
+  interval for a few seconds: a wall-clock sampling profile of whatever the
+  worker is doing, from the calling thread and with no tracing hooks.
+* ``RequestTracer`` runs cProfile around the sync endpoints of requests that
+  arrive while it is armed and whose path matches a prefix. Only the endpoint
+  function body is traced: FastAPI resolves dependencies and validates and
+  serializes the ``response_model`` in separate calls (partly on the event
+  loop, partly on other threadpool threads), which the sampler covers.
+
+Nothing runs between captures: the sampler only exists for the duration of a
+call, and the request hooks reduce to one attribute check per request and one
+context-variable lookup per sync endpoint call. Only one capture runs at a
+time, and every capture is clamped to ``MAX_CAPTURE_SECONDS``.
+
+Results are ``Profile`` objects exportable as collapsed stacks (the input
+format of flamegraph.pl / inferno) or speedscope JSON.
+"""
+import cProfile
+import functools
+import inspect
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+
+logger = logging.getLogger(__name__)
+
+MAX_CAPTURE_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+DEFAULT_INTERVAL = 0.01
+
+# (function name, file, first line); file/line are None for synthetic roots
+# (thread names, request labels) and C functions.
+Frame = Tuple[str, Optional[str], Optional[int]]
+Stack = Tuple[Frame, ...]
+
+# Leaf frames of a thread blocked waiting for work; dropped unless idle
+# samples are requested.
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+}
+
+_capture_lock = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a capture is requested while another one is running."""
+
+
+def clamp_seconds(seconds: float) -> float:
+    return max(0.0, min(float(seconds), MAX_CAPTURE_SECONDS))
+
+
+class Profile:
+    """Aggregated stacks with a weight each.
+
+    ``stacks`` weights are integers in the profile's native unit (samples for
+    the sampler, microseconds for cProfile); ``scale`` converts them to
+    ``unit`` for speedscope. Every stack starts with a synthetic root frame
+    naming its thread or request, which becomes one speedscope profile each.
+    """
+
+    def __init__(self, name: str, stacks: Dict[Stack, int], unit: str, scale: float) -> None:
+        self.name = name
+        self.stacks = stacks
+        self.unit = unit
+        self.scale = scale
+
+    def collapsed(self) -> str:
+        lines = sorted(
+            ";".join(_label(f) for f in stack) + f" {weight}"
+            for stack, weight in self.stacks.items()
+            if weight > 0
+        )
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def speedscope(self) -> dict:
+        frames: List[dict] = []
+        index: Dict[Frame, int] = {}
+        by_root: Dict[Frame, Tuple[List[List[int]], List[float]]] = {}
+        for stack, weight in self.stacks.items():
+            if weight <= 0 or len(stack) < 2:
+                continue
+            samples, weights = by_root.setdefault(stack[0], ([], []))
+            ids = []
+            for f in stack[1:]:
+                if f not in index:
+                    index[f] = len(frames)
+                    entry = {"name": f[0]}
+                    if f[1] is not None:
+                        entry.update(file=f[1], line=f[2])
+                    frames.append(entry)
+                ids.append(index[f])
+            samples.append(ids)
+            weights.append(weight * self.scale)
+        profiles = [
+            {
+                "type": "sampled",
+                "name": root[0],
+                "unit": self.unit,
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }
+            for root, (samples, weights) in by_root.items()
+        ]
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "bkend.profiling",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+def _label(frame: Frame) -> str:
+    name, path, line = frame
+    label = name if path is None else f"{name} ({path}:{line})"
+    # ';' separates frames in the collapsed format.
+    return label.replace(";", ":")
+
+
+@functools.lru_cache(maxsize=4096)
+def _short_path(filename: str) -> str:
+    # Relative to the longest matching sys.path entry, so site-packages and
+    # the project root don't repeat in every frame.
+    best = ""
+    for entry in sys.path:
+        entry = entry or os.getcwd()
+        if filename.startswith(entry.rstrip(os.sep) + os.sep) and len(entry) > len(best):
+            best = entry
+    return filename[len(best.rstrip(os.sep)) + 1:] if best else filename
+
+
+@functools.lru_cache(maxsize=8192)
+def _code_frame(code) -> Frame:
+    name = getattr(code, "co_qualname", code.co_name)
+    return (name, _short_path(code.co_filename), code.co_firstlineno)
+
+
+def _stack_of(frame) -> Stack:
+    stack = []
+    while frame is not None:
+        stack.append(_code_frame(frame.f_code))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def _is_idle(stack: Stack) -> bool:
+    if not stack:
+        return True
+    name, path, _ = stack[-1]
+    return (os.path.basename(path or ""), name.rsplit(".", 1)[-1]) in IDLE_LEAVES
+
+
+def sample(seconds: float, interval: float = DEFAULT_INTERVAL, include_idle: bool = False) -> Profile:
+    """Sample all other threads' stacks every ``interval`` for ``seconds``.
+
+    Blocks the calling thread for the (clamped) duration.
+    """
+    seconds = clamp_seconds(seconds)
+    interval = max(interval, 0.001)
+    if not _capture_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile capture is already running")
+    try:
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        ticks = 0
+        started = time.monotonic()
+        deadline = started + seconds
+        next_tick = started
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = _stack_of(frame)
+                if not include_idle and _is_idle(stack):
+                    continue
+                root = (f"thread {names.get(ident, ident)}", None, None)
+                stacks[(root,) + stack] += 1
+            ticks += 1
+            next_tick += interval
+            time.sleep(max(0.0, min(next_tick, deadline) - time.monotonic()))
+        elapsed = time.monotonic() - started
+    finally:
+        _capture_lock.release()
+    ms_per_sample = elapsed * 1000 / ticks if ticks else 0.0
+    return Profile(f"sampled {elapsed:.2f}s, {ticks} ticks", dict(stacks), "milliseconds", ms_per_sample)
+
+
+def _pstats_frame(func: Tuple[str, int, str]) -> Frame:
+    filename, line, name = func
+    if filename == "~":  # C function
+        return (name, None, None)
+    return (name, _short_path(filename), line)
+
+
+def stacks_from_stats(stats: pstats.Stats, root: Frame, max_depth: int = 64) -> Dict[Stack, int]:
+    """Approximate call stacks (weights in microseconds) from a cProfile run.
+
+    cProfile only records caller/callee pairs, so a function's time is split
+    across its call paths in proportion to the time each caller spent in it.
+    Recursive edges are cut and sub-microsecond branches dropped.
+    """
+    table = stats.stats  # type: ignore[attr-defined]
+    callees: Dict[tuple, Dict[tuple, float]] = {}
+    for func, (_cc, _nc, _tt, _ct, callers) in table.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[func] = edge[3]
+    out: Counter = Counter()
+
+    def walk(func, path: Stack, on_path: frozenset, budget: float) -> None:
+        _cc, _nc, tt, ct, _callers = table[func]
+        share = budget / ct if ct else 0.0
+        out[path] += int(tt * share * 1e6)
+        if len(path) >= max_depth:
+            return
+        for callee, edge_ct in callees.get(func, {}).items():
+            child = edge_ct * share
+            if callee in on_path or child < 1e-6:
+                continue
+            walk(callee, path + (_pstats_frame(callee),), on_path | {callee}, child)
+
+    for func, entry in table.items():
+        if not entry[4]:
+            walk(func, (root, _pstats_frame(func)), frozenset([func]), entry[3])
+    return {stack: weight for stack, weight in out.items() if weight > 0}
+
+
+_current_trace: ContextVar[Optional[str]] = ContextVar("profiling_trace", default=None)
+
+
+class RequestTracer:
+    """cProfile traces of sync endpoints for requests matching a path prefix."""
+
+    def __init__(self) -> None:
+        self.armed = False
+        self.path_prefix = "/"
+        self.max_requests = 0
+        self.requests = 0
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, pstats.Stats] = {}
+
+    def admit(self, method: str, path: str) -> Optional[str]:
+        """Label to trace this request under, or None to leave it alone."""
+        if not self.armed or not path.startswith(self.path_prefix):
+            return None
+        with self._lock:
+            if not self.armed or self.requests >= self.max_requests:
+                return None
+            self.requests += 1
+            if self.requests >= self.max_requests:
+                self._done.set()
+        return f"{method} {path}"
+
+    def record(self, label: str, profiler: cProfile.Profile) -> None:
+        with self._lock:
+            if label in self._stats:
+                self._stats[label].add(profiler)
+            else:
+                self._stats[label] = pstats.Stats(profiler)
+
+    def capture(self, seconds: float, path_prefix: str = "/", max_requests: int = 100) -> Profile:
+        """Arm for up to ``seconds`` (clamped) or ``max_requests`` requests."""
+        seconds = clamp_seconds(seconds)
+        if not _capture_lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile capture is already running")
+        try:
+            with self._lock:
+                self._stats = {}
+                self.requests = 0
+                self.path_prefix = path_prefix
+                self.max_requests = max_requests
+                self._done.clear()
+                self.armed = True
+            started = time.monotonic()
+            self._done.wait(seconds)
+            with self._lock:
+                self.armed = False
+                collected, count = self._stats, self.requests
+                self._stats = {}
+            elapsed = time.monotonic() - started
+        finally:
+            _capture_lock.release()
+        stacks: Dict[Stack, int] = {}
+        for label, stats in collected.items():
+            stacks.update(stacks_from_stats(stats, (label, None, None)))
+        return Profile(f"cProfile {count} requests in {elapsed:.2f}s", stacks, "milliseconds", 0.001)
+
+
+request_tracer = RequestTracer()
+
+
+class RequestTraceMiddleware:
+    """Marks requests admitted by ``tracer`` so their endpoints get profiled."""
+
+    def __init__(self, app, tracer: RequestTracer = request_tracer) -> None:
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not self.tracer.armed:
+            await self.app(scope, receive, send)
+            return
+        label = self.tracer.admit(scope["method"], scope["path"])
+        if label is None:
+            await self.app(scope, receive, send)
+            return
+        token = _current_trace.set(label)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_trace.reset(token)
+
+
+# One traced call at a time: from Python 3.12 cProfile hooks into the
+# process-wide sys.monitoring and a second active profiler raises.
+_trace_lock = threading.Lock()
+
+
+def _start_profiler() -> Optional[cProfile.Profile]:
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except Exception:
+        # Another profiling tool (a debugger, coverage, py-spy) is active.
+        logger.warning("Could not enable cProfile; request runs untraced", exc_info=True)
+        return None
+    return profiler
+
+
+def traced(endpoint, tracer: RequestTracer = request_tracer):
+    """Wrap a sync endpoint so admitted requests run it under cProfile.
+
+    Sync endpoints run on a threadpool thread (which inherits the request's
+    context). Traced calls are serialized; an admitted request that finds
+    another one being traced, or cannot enable the profiler, simply runs
+    untraced, so tracing never fails a request. Where cProfile hooks are
+    process-wide (Python 3.12+), work on other threads during the call is
+    included too. Async endpoints share the event loop thread and are
+    returned unchanged.
+    """
+    if inspect.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        label = _current_trace.get()
+        if label is None or not _trace_lock.acquire(blocking=False):
+            return endpoint(*args, **kwargs)
+        try:
+            profiler = _start_profiler()
+            if profiler is None:
+                return endpoint(*args, **kwargs)
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                try:
+                    profiler.disable()
+                    tracer.record(label, profiler)
+                except Exception:
+                    logger.exception("Dropping cProfile trace of %s", label)
+        finally:
+            _trace_lock.release()
+
+    return wrapper
+
+
+class TracedRoute(APIRoute):
+    """Route class registering endpoints through ``traced``."""
+
+    def __init__(self, path: str, endpoint, **kwargs) -> None:
+        super().__init__(path, traced(endpoint), **kwargs)
+
@@ -0,0 +1,163 @@
+"""Article revision history stored as compressed deltas.
+
+Every edit appends an ``article_revisions`` row. Most rows hold a
+zlib-compressed delta against the previous revision's content: a JSON list of
+``[start, end]`` copy ranges (character offsets into the previous text) and
+inserted strings, computed from a word-level diff. Every
+``SNAPSHOT_INTERVAL`` revisions a full compressed snapshot is stored instead,
+so rebuilding any revision replays at most ``SNAPSHOT_INTERVAL - 1`` deltas.
+"""
+import json
+import os
+import re
+import zlib
+from datetime import datetime, timezone
+from difflib import SequenceMatcher
+from typing import List, Optional, Union
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .models import Article, ArticleRevision
+
+SNAPSHOT_INTERVAL = int(os.getenv("ARTICLE_SNAPSHOT_INTERVAL", "16"))
+
+_TOKEN = re.compile(r"\s+|[^\s]+")
+
+Delta = List[Union[List[int], str]]
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN.findall(text)
+
+
+def make_delta(old: str, new: str) -> Delta:
+    """Describe ``new`` as copies from ``old`` plus inserted text."""
+    old_tokens, new_tokens = _tokens(old), _tokens(new)
+    # Character offset at which each old token starts (plus the end).
+    offsets = [0]
+    for token in old_tokens:
+        offsets.append(offsets[-1] + len(token))
+    # Edits are usually local: strip the common prefix/suffix so the
+    # (super-linear) matcher only sees the changed middle.
+    limit = min(len(old_tokens), len(new_tokens))
+    head = 0
+    while head < limit and old_tokens[head] == new_tokens[head]:
+        head += 1
+    tail = 0
+    while tail < limit - head and old_tokens[-1 - tail] == new_tokens[-1 - tail]:
+        tail += 1
+    old_end, new_end = len(old_tokens) - tail, len(new_tokens) - tail
+
+    delta: Delta = []
+    if head:
+        delta.append([0, offsets[head]])
+    matcher = SequenceMatcher(None, old_tokens[head:old_end], new_tokens[head:new_end])
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append([offsets[head + i1], offsets[head + i2]])
+        elif j2 > j1:
+            delta.append("".join(new_tokens[head + j1:head + j2]))
+    if tail:
+        delta.append([offsets[old_end], offsets[-1]])
+    return delta
+
+
+def apply_delta(old: str, delta: Delta) -> str:
+    return "".join(old[op[0]:op[1]] if isinstance(op, list) else op for op in delta)
+
+
+def _pack(value) -> bytes:
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+def _unpack(data: bytes):
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+def latest_rev(db: Session, article_id: int) -> int:
+    return db.execute(
+        select(func.max(ArticleRevision.rev)).where(ArticleRevision.article_id == article_id)
+    ).scalar_one() or 0
+
+
+def record_revision(
+        db: Session,
+        article: Article,
+        rev: int,
+        previous_content: Optional[str] = None,
+        editor_id: Optional[int] = None
+    ) -> ArticleRevision:
+    """Add revision ``rev`` holding ``article``'s current state (no commit).
+
+    ``previous_content`` is the content of revision ``rev - 1``; it is only
+    needed when this revision is stored as a delta.
+    """
+    is_snapshot = (rev - 1) % SNAPSHOT_INTERVAL == 0
+    if is_snapshot:
+        data = _pack(article.content)
+    else:
+        data = _pack(make_delta(previous_content, article.content))
+    revision = ArticleRevision(
+        article_id=article.id,
+        rev=rev,
+        title=article.title,
+        is_snapshot=is_snapshot,
+        data=data,
+        editor_id=editor_id,
+        created_at=datetime.now(timezone.utc),
+    )
+    db.add(revision)
+    return revision
+
+
+def list_revisions(db: Session, article_id: int) -> List[dict]:
+    """Revision metadata, oldest first; content is not reconstructed."""
+    rows = db.execute(
+        select(
+            ArticleRevision.rev,
+            ArticleRevision.title,
+            ArticleRevision.is_snapshot,
+            ArticleRevision.editor_id,
+            ArticleRevision.created_at,
+            func.length(ArticleRevision.data).label("stored_bytes"),
+        )
+        .where(ArticleRevision.article_id == article_id)
+        .order_by(ArticleRevision.rev)
+    ).all()
+    return [row._asdict() for row in rows]
+
+
+def get_revision(db: Session, article_id: int, rev: int) -> Optional[dict]:
+    """Return ``title``/``content`` and metadata of ``rev``, or None if missing."""
+    snapshot_rev = db.execute(
+        select(func.max(ArticleRevision.rev)).where(
+            ArticleRevision.article_id == article_id,
+            ArticleRevision.rev <= rev,
+            ArticleRevision.is_snapshot.is_(True),
+        )
+    ).scalar_one()
+    if snapshot_rev is None:
+        return None
+    chain = db.execute(
+        select(ArticleRevision)
+        .where(
+            ArticleRevision.article_id == article_id,
+            ArticleRevision.rev >= snapshot_rev,
+            ArticleRevision.rev <= rev,
+        )
+        .order_by(ArticleRevision.rev)
+    ).scalars().all()
+    if not chain or chain[-1].rev != rev:
+        return None
+    content = _unpack(chain[0].data)
+    for revision in chain[1:]:
+        content = apply_delta(content, _unpack(revision.data))
+    target = chain[-1]
+    return {
+        "rev": target.rev,
+        "title": target.title,
+        "content": content,
+        "editor_id": target.editor_id,
+        "created_at": target.created_at,
+    }
@@ -2,7 +2,9 @@ import enum
 from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel, ConfigDict, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr, computed_field
+
+from .images import image_urls
 
 
 # Enum used by request/response schemas. Kept here to avoid creating a
@@ -14,6 +16,17 @@ class VoteType(enum.Enum):
     DOWNVOTE = "downvote"
 
 
+class RollupGranularity(enum.Enum):
+    MINUTE = "minute"
+    HOUR = "hour"
+    DAY = "day"
+
+
+class ProfileFormat(enum.Enum):
+    COLLAPSED = "collapsed"
+    SPEEDSCOPE = "speedscope"
+
+
 class UserCreate(BaseModel):
     email: EmailStr
     password: str
@@ -53,9 +66,40 @@ class ArticleResponse(BaseModel):
     upvotes: int
     downvotes: int
     user_vote: Optional[str] = None
+    image_hash: Optional[str] = None
+    image_width: Optional[int] = None
+    image_variants_ready: Optional[bool] = None
 
     model_config = ConfigDict(from_attributes=True)
 
+    @computed_field
+    @property
+    def images(self) -> Optional[dict]:
+        """``src`` and per-format ``srcset`` URLs for the article image."""
+        return image_urls(self.image_hash, self.image_width, self.image_variants_ready)
+
+
+class ArticleRevisionResponse(BaseModel):
+    rev: int
+    title: str
+    is_snapshot: bool
+    editor_id: Optional[int] = None
+    created_at: datetime
+    stored_bytes: int
+
+
+class VoteBucketResponse(BaseModel):
+    bucket_start: datetime
+    upvotes: int
+    downvotes: int
+
+
+class TrendingArticleResponse(BaseModel):
+    article_id: int
+    upvotes: int
+    downvotes: int
+    score: int
+
 
 class VoteCreate(BaseModel):
     vote_type: VoteType
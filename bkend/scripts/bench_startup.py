@@ -0,0 +1,71 @@
+"""Cold-start benchmark: import time and time to first request.
+
+Each sample runs in a fresh interpreter against a throwaway SQLite database,
+so it measures what a newly spawned uvicorn worker pays. Exits non-zero when
+the median exceeds the budget, which makes it usable as a CI gate.
+
+Run from the project root:  python -m bkend.scripts.bench_startup
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Prints "<import_ms> <first_request_ms>", both measured from before the import.
+PROBE = """
+import time
+t0 = time.perf_counter()
+import bkend.main as m
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(m.app) as client:
+    assert client.get("/articles").status_code == 200
+    t2 = time.perf_counter()
+print((t1 - t0) * 1000, (t2 - t0) * 1000)
+"""
+
+
+def sample() -> tuple:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{Path(tmp) / 'bench.db'}",
+            "PYTHONPATH": str(ROOT),
+            "JOB_WORKERS": "0",
+        }
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE], env=env, cwd=tmp, check=True, capture_output=True, text=True
+        ).stdout.split()
+    return float(out[0]), float(out[1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=750)
+    parser.add_argument("--first-request-budget-ms", type=float, default=2000)
+    args = parser.parse_args()
+
+    samples = [sample() for _ in range(args.runs)]
+    import_ms = statistics.median(s[0] for s in samples)
+    first_request_ms = statistics.median(s[1] for s in samples)
+    report = {
+        "runs": args.runs,
+        "import_ms": round(import_ms, 1),
+        "first_request_ms": round(first_request_ms, 1),
+        "import_budget_ms": args.import_budget_ms,
+        "first_request_budget_ms": args.first_request_budget_ms,
+    }
+    print(json.dumps(report, indent=2))
+    if import_ms > args.import_budget_ms or first_request_ms > args.first_request_budget_ms:
+        sys.exit("startup budget exceeded")
+
+
+if __name__ == "__main__":
+    main()
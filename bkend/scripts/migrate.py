@@ -0,0 +1,17 @@
+from bkend import models
+
+
+def main() -> None:
+    """Create missing tables and columns.
+
+    The app does this in its lifespan handler unless BACKEND_INIT_DB=0; run
+    this once before starting workers when that is disabled.
+
+    Run from the project root:  python -m bkend.scripts.migrate
+    """
+    models.init_db()
+    print(f"Database schema is up to date ({models.DATABASE_URL})")
+
+
+if __name__ == "__main__":
+    main()
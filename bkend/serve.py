@@ -0,0 +1,31 @@
+"""Run the app with several uvicorn worker processes from one entry point.
+
+The schema is migrated once here, before the workers start, so they don't
+race on ``create_all``. Workers keep their in-process caches coherent through
+the database change log (``bkend.invalidation``) and share the durable job
+queue, whose leases make it safe to drain from every process.
+
+Run from the project root:  python -m bkend.serve --workers 4
+"""
+import argparse
+import os
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the API with multiple worker processes.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    from . import models
+
+    models.init_db()
+    os.environ["BACKEND_INIT_DB"] = "0"
+    uvicorn.run("bkend.main:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
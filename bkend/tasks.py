@@ -0,0 +1,58 @@
+"""Handlers for deferred jobs; importing this module registers them."""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from . import analytics, images
+from .compression import available_encodings
+from .crud import get_anonymous_article_page, mark_image_variants_ready
+from .jobs import enqueue, job
+
+
+@job("warm_article_pages")
+def warm_article_pages(db: Session, payload: Dict[str, Any]) -> None:
+    """Rebuild the default anonymous article list after a write invalidated it."""
+    get_anonymous_article_page(db).encoded(available_encodings()[0])
+
+
+@job("image_variants")
+def image_variants(db: Session, payload: Dict[str, Any]) -> None:
+    """Generate resized variants on the image process pool, then publish them."""
+    future = images.schedule_variants(images.image_dir(payload["image_hash"]) / "original", payload["width"])
+    if future is not None:
+        future.result()
+    mark_image_variants_ready(db, payload["image_hash"])
+
+
+def schedule_rollup_compaction(db: Session, at: Optional[datetime] = None) -> None:
+    """Enqueue the compactor run for the hour containing ``at`` (idempotent).
+
+    Every worker calls this on startup; the idempotency key collapses those
+    calls into a single job per hour. A run for that hour which already
+    failed is retried, so a restart also revives a broken chain.
+    """
+    at = at or datetime.now(timezone.utc)
+    hour = at.replace(minute=0, second=0, microsecond=0)
+    delay = max(0.0, (hour - datetime.now(timezone.utc)).total_seconds())
+    enqueue(
+        db,
+        "compact_vote_rollups",
+        idempotency_key=f"compact_vote_rollups:{hour.isoformat()}",
+        delay=delay,
+        retry_failed=True,
+    )
+
+
+@job("compact_vote_rollups")
+def compact_vote_rollups(db: Session, payload: Dict[str, Any]) -> None:
+    """Drop expired minute/hour rollups, then schedule the next hourly run.
+
+    The next run is scheduled even if compaction fails, so one job that
+    exhausts its attempts does not end the hourly chain.
+    """
+    try:
+        analytics.compact(db)
+    finally:
+        db.rollback()  # no-op after a successful compact (it commits)
+        schedule_rollup_compaction(db, datetime.now(timezone.utc) + timedelta(hours=1))
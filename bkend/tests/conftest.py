@@ -0,0 +1,56 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from bkend import models, main as app_main
+from bkend.cache import article_pages
+from bkend.vote_index import vote_index
+
+
+@pytest.fixture(autouse=True)
+def reset_process_caches():
+    # Each test gets a fresh database, but these caches are process-wide and
+    # keyed by ids that repeat across databases.
+    article_pages.invalidate()
+    vote_index.invalidate(None)
+    yield
+    article_pages.invalidate()
+    vote_index.invalidate(None)
+
+
+@pytest.fixture()
+def session_factory():
+    """Sessions on a fresh in-memory database (one shared connection)."""
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+        future=True,
+    )
+    models.init_db(engine_override=engine)
+    return sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+
+@pytest.fixture()
+def db_session(session_factory):
+    with session_factory() as session:
+        yield session
+
+
+@pytest.fixture()
+def api_client(session_factory):
+    """TestClient for the app, with get_db bound to ``session_factory``."""
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app_main.app.dependency_overrides[app_main.get_db] = override_get_db
+    try:
+        yield TestClient(app_main.app)
+    finally:
+        app_main.app.dependency_overrides.clear()
@@ -0,0 +1,101 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from bkend import analytics, crud, jobs, models, tasks, main as app_main
+from bkend.schemas import RollupGranularity, VoteType
+
+
+def test_vote_timestamps_are_per_row(db_session):
+    user = crud.create_user(db_session, email="t1@example.com", hashed_password="pw")
+    article = crud.create_article(db_session, title="A", content="a", author_id=user.id)
+    crud.add_or_toggle_vote(db_session, article_id=article.id, user_id=user.id, vote_type=VoteType.UPVOTE)
+    first = crud.get_user_vote(db_session, article.id, user.id).created_at
+    time.sleep(0.01)
+    other = crud.create_user(db_session, email="t2@example.com", hashed_password="pw")
+    crud.add_or_toggle_vote(db_session, article_id=article.id, user_id=other.id, vote_type=VoteType.UPVOTE)
+    assert crud.get_user_vote(db_session, article.id, other.id).created_at > first
+
+
+def test_bucket_start():
+    ts = datetime(2026, 10, 19, 13, 47, 12, 5)
+    assert analytics.bucket_start(ts, RollupGranularity.MINUTE) == datetime(2026, 10, 19, 13, 47)
+    assert analytics.bucket_start(ts, RollupGranularity.HOUR) == datetime(2026, 10, 19, 13)
+    assert analytics.bucket_start(ts, RollupGranularity.DAY) == datetime(2026, 10, 19)
+
+
+@pytest.mark.parametrize("upsert", [True, False])
+def test_record_vote_delta_accumulates(db_session, monkeypatch, upsert):
+    if not upsert:
+        monkeypatch.setattr(analytics, "_UPSERT_INSERTS", {})
+    user = crud.create_user(db_session, email="acc@example.com", hashed_password="pw")
+    article = crud.create_article(db_session, title="A", content="a", author_id=user.id)
+    at = datetime(2026, 10, 19, 13, 47)
+    analytics.record_vote_delta(db_session, article.id, 1, 0, at=at)
+    analytics.record_vote_delta(db_session, article.id, 2, -1, at=at + timedelta(seconds=5))
+    db_session.commit()
+    rows = db_session.execute(select(models.VoteRollup.upvotes, models.VoteRollup.downvotes)).all()
+    assert sorted(rows) == [(3, -1)] * len(RollupGranularity)
+
+
+def test_rollups_follow_vote_changes(db_session):
+    admin = crud.create_user(db_session, email="boss@example.com", hashed_password="pw")
+    voters = [crud.create_user(db_session, email=f"v{i}@example.com", hashed_password="pw") for i in range(3)]
+    hot = crud.create_article(db_session, title="Hot", content="h", author_id=admin.id)
+    cold = crud.create_article(db_session, title="Cold", content="c", author_id=admin.id)
+
+    for voter in voters:
+        crud.add_or_toggle_vote(db_session, article_id=hot.id, user_id=voter.id, vote_type=VoteType.UPVOTE)
+    # switch: -1 up, +1 down; toggle off: -1 down; remove: -1 up
+    crud.add_or_toggle_vote(db_session, article_id=hot.id, user_id=voters[0].id, vote_type=VoteType.DOWNVOTE)
+    crud.add_or_toggle_vote(db_session, article_id=hot.id, user_id=voters[0].id, vote_type=VoteType.DOWNVOTE)
+    crud.remove_vote(db_session, article_id=hot.id, user_id=voters[1].id)
+    crud.add_or_toggle_vote(db_session, article_id=cold.id, user_id=voters[2].id, vote_type=VoteType.DOWNVOTE)
+
+    now = datetime.now(timezone.utc)
+    for granularity in RollupGranularity:
+        series = analytics.vote_series(db_session, hot.id, granularity, now - timedelta(days=1), now + timedelta(minutes=1))
+        assert series
+        assert sum(b["upvotes"] for b in series) == 1
+        assert sum(b["downvotes"] for b in series) == 0
+
+    ranked = app_main.trending_articles(hours=1, limit=10, current_user=admin, db=db_session)
+    assert [(r["article_id"], r["score"]) for r in ranked] == [(hot.id, 1), (cold.id, -1)]
+
+    # Expired minute buckets are compacted; hour/day buckets survive.
+    def bucket_counts():
+        rows = db_session.execute(
+            select(models.VoteRollup.granularity, func.count()).group_by(models.VoteRollup.granularity)
+        ).all()
+        return dict(rows)
+
+    before = bucket_counts()
+    assert analytics.compact(db_session, now + timedelta(days=3)) == before["minute"]
+    assert bucket_counts() == {"hour": before["hour"], "day": before["day"]}
+
+    crud.delete_article(db_session, article_id=hot.id)
+    assert analytics.vote_series(db_session, hot.id, RollupGranularity.DAY, now - timedelta(days=1), now) == []
+
+
+def test_failed_compaction_keeps_the_hourly_chain(session_factory, monkeypatch):
+    def boom(db, now=None):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(analytics, "compact", boom)
+    worker = jobs.JobWorker(session_factory)
+    with session_factory() as db:
+        current = jobs.enqueue(db, "compact_vote_rollups", max_attempts=1)
+    assert worker.run_once() is True
+
+    with session_factory() as db:
+        assert db.get(models.Job, current.id).status == jobs.FAILED
+        pending = db.execute(select(models.Job).where(models.Job.status == jobs.PENDING)).scalars().all()
+        assert [j.kind for j in pending] == ["compact_vote_rollups"]
+
+        # A failed run for the current hour is revived by startup scheduling.
+        pending[0].status = jobs.FAILED
+        db.commit()
+        tasks.schedule_rollup_compaction(db, pending[0].run_at.replace(tzinfo=timezone.utc))
+        assert db.get(models.Job, pending[0].id).status == jobs.PENDING
@@ -91,6 +91,7 @@ def test_update_and_delete_endpoints(in_memory_session):
     updated = app_main.update_article(
         article_id=art.id,
         article_update=ArticleUpdate(title="NewTitle"),
+        _current_user=admin,
         db=db
     )
     assert updated["title"] == "NewTitle"
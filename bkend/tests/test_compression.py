@@ -0,0 +1,101 @@
+import gzip
+
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from bkend import crud
+from bkend.cache import article_pages
+from bkend.compression import CompressionMiddleware, negotiate_encoding
+from bkend.schemas import VoteType
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("*") is not None
+    assert negotiate_encoding("*, gzip;q=0") != "gzip"
+
+
+def _small_app():
+    async def big(request):
+        return JSONResponse({"items": ["satire"] * 200})
+
+    async def small(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/big", big), Route("/small", small)])
+    return CompressionMiddleware(app, minimum_size=100)
+
+
+def test_middleware_respects_threshold_and_negotiation():
+    client = TestClient(_small_app())
+    resp = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in resp.headers["vary"]
+    assert resp.json()["items"][0] == "satire"
+
+    resp = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in resp.headers
+
+    resp = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in resp.headers
+
+
+def test_anonymous_article_pages_are_cached_precompressed(api_client, session_factory):
+    with session_factory() as db:
+        user = crud.create_user(db, email="reader@example.com", hashed_password="pw")
+        article = crud.create_article(db, title="Long", content="satire " * 200, author_id=user.id)
+
+    resp = api_client.get("/articles", headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.json()[0]["title"] == "Long"
+
+    page = article_pages.get((0, None))
+    assert page is not None
+    stored = page.encoded("gzip")
+    assert gzip.decompress(stored) == page.body
+
+    # Second request reuses the stored compressed bytes.
+    api_client.get("/articles", headers={"Accept-Encoding": "gzip"})
+    assert page.encoded("gzip") is stored
+
+    # Each encoding has its own ETag; revalidation accepts weak and listed tags.
+    gzip_etag = page.etag_for("gzip")
+    assert resp.headers["etag"] == gzip_etag != page.etag
+    resp = api_client.get("/articles", headers={"Accept-Encoding": "gzip", "If-None-Match": f'"x", W/{gzip_etag}'})
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == gzip_etag
+    resp = api_client.get("/articles", headers={"Accept-Encoding": "identity", "If-None-Match": gzip_etag})
+    assert resp.status_code == 200 and resp.headers["etag"] == page.etag
+    resp = api_client.get("/articles", headers={"Accept-Encoding": "identity", "If-None-Match": page.etag})
+    assert resp.status_code == 304
+
+    # A write invalidates the cached page.
+    with session_factory() as db:
+        crud.add_or_toggle_vote(db, article_id=article.id, user_id=user.id, vote_type=VoteType.UPVOTE)
+    assert article_pages.get((0, None)) is None
+    assert api_client.get("/articles").json()[0]["upvotes"] == 1
+
+
+def test_only_canonical_pages_are_cached(api_client, session_factory):
+    with session_factory() as db:
+        user = crud.create_user(db, email="pager@example.com", hashed_password="pw")
+        for i in range(3):
+            crud.create_article(db, title=f"A{i}", content="c", author_id=user.id)
+
+    assert api_client.get("/articles?limit=101").status_code == 422
+    front = api_client.get("/articles").json()
+    front_page = article_pages.get((0, None))
+    assert front_page is not None
+    for skip in range(1, 60):
+        resp = api_client.get(f"/articles?skip={skip % 3}&limit={1 + skip % 50}")
+        assert resp.status_code == 200
+    assert [a["id"] for a in api_client.get("/articles?skip=1&limit=1").json()] == [front[1]["id"]]
+    # Arbitrary (skip, limit) pairs are served uncached and evict nothing.
+    assert len(article_pages) == 1
+    assert article_pages.get((0, None)) is front_page
@@ -0,0 +1,81 @@
+import re
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from bkend import crud
+from bkend.cache import article_pages
+from bkend.frontend import FIRST_PAGE_SIZE, hashed_name, mount_frontend
+
+
+@pytest.fixture()
+def frontend(session_factory):
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    manifest = mount_frontend(app, get_db)
+    article_pages.invalidate()
+    try:
+        yield TestClient(app), manifest, session_factory
+    finally:
+        article_pages.invalidate()
+
+
+def test_hashed_name():
+    assert hashed_name("media/logo.png", b"x").startswith("media/logo.")
+    assert hashed_name("media/logo.png", b"x").endswith(".png")
+    assert hashed_name("script.js", b"a") != hashed_name("script.js", b"b")
+
+
+def test_assets_are_hashed_immutable_and_precompressed(frontend):
+    client, manifest, _ = frontend
+    url = manifest.urls["styles.css"]
+    assert url != "/assets/styles.css"
+    resp = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert "immutable" in resp.headers["cache-control"]
+    assert resp.headers["content-encoding"] == "gzip"
+
+    resp = client.get(manifest.urls["media/cfclasspic.png"], headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-type"] == "image/png"
+    assert "content-encoding" not in resp.headers
+
+    assert client.get("/assets/styles.css").status_code == 404
+
+
+def test_index_inlines_first_page(frontend):
+    client, manifest, Session = frontend
+    with Session() as db:
+        user = crud.create_user(db, email="fe@example.com", hashed_password="pw")
+        crud.create_article(db, title="<Breaking>", content="Satire", author_id=user.id)
+
+    resp = client.get("/")
+    assert resp.status_code == 200
+    assert resp.headers["cache-control"] == "no-cache"
+    markup = resp.text
+    assert manifest.urls["script.js"] in markup
+    assert 'data-prerendered="true"' in markup
+    assert f'data-first-page-size="{FIRST_PAGE_SIZE}"' in markup
+    assert "&lt;Breaking&gt;" in markup
+
+
+def test_served_script_uses_only_resolvable_assets(frontend):
+    client, manifest, _ = frontend
+    markup = client.get("/").text
+    script = client.get(manifest.urls["script.js"]).text
+
+    # Relative asset paths are only rewritten in index.html, never in script.js.
+    for logical in manifest.urls:
+        assert logical not in script
+    for url in re.findall(r"/assets/[^\s'\"`)]+", script):
+        assert client.get(url).status_code == 200
+
+    fallback = re.search(r'data-fallback-image="([^"]+)"', markup).group(1)
+    assert fallback == manifest.urls["media/cfclasspic.png"]
+    assert client.get(fallback).status_code == 200
@@ -0,0 +1,140 @@
+import io
+
+import pytest
+from sqlalchemy import delete, select
+
+from bkend import crud, images, jobs, models, main as app_main
+
+PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+
+
+def _png(width=800, height=400):
+    Image = pytest.importorskip("PIL.Image")
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_sniff_mime_and_urls():
+    assert images.sniff_mime(PNG_HEADER + b"rest") == "image/png"
+    assert images.sniff_mime(b"GIF89a") == "image/gif"
+    assert images.sniff_mime(b"<svg>") is None
+
+    assert images.image_urls(None, None) is None
+    assert images.image_urls("ab" * 32, 800)["sources"] == []
+    urls = images.image_urls("ab" * 32, 800, variants_ready=True)
+    assert urls["src"] == f"/images/{'ab' * 32}/original"
+    for source in urls["sources"]:
+        assert source["srcset"].endswith(" 800w")
+        assert " 320w" in source["srcset"]
+        assert " 1024w" not in source["srcset"]
+
+
+def test_generate_variants(tmp_path):
+    data = _png()
+    image_hash, path = images.store_original(data, root=tmp_path)
+    assert path == images.image_dir(image_hash, tmp_path) / "original"
+    # Storing the same bytes again is a no-op (content-addressed).
+    assert images.store_original(data, root=tmp_path) == (image_hash, path)
+
+    widths = images.variant_widths(images.probe_width(data))
+    assert widths == [320, 640, 800]
+    written = images.generate_variants(str(path), widths, images.variant_formats())
+    assert "320.jpg" in written
+    assert images.generate_variants(str(path), widths, images.variant_formats()) == []
+
+    from PIL import Image
+    with Image.open(path.parent / "320.jpg") as im:
+        assert im.size == (320, 160)
+
+
+@pytest.fixture()
+def image_client(api_client, tmp_path, monkeypatch):
+    """App client storing images under ``tmp_path``, with admin checks bypassed."""
+    monkeypatch.setattr(images, "IMAGE_DIR", tmp_path)
+    app_main.app.dependency_overrides[app_main.get_admin_user] = lambda: None
+    return api_client
+
+
+def test_upload_and_serve_with_range(image_client, session_factory):
+    with session_factory() as db:
+        user = crud.create_user(db, email="img@example.com", hashed_password="pw")
+        article = crud.create_article(db, title="Pic", content="c", author_id=user.id)
+
+    data = PNG_HEADER + b"\x00" * 100
+    resp = image_client.post(f"/articles/{article.id}/image", files={"file": ("a.png", data, "image/png")})
+    assert resp.status_code == 202
+    body = resp.json()
+    assert body["image_hash"] is not None
+    src = body["images"]["src"]
+
+    resp = image_client.get(src)
+    assert resp.content == data
+    assert resp.headers["content-type"] == "image/png"
+    assert "immutable" in resp.headers["cache-control"]
+
+    resp = image_client.get(src, headers={"Range": "bytes=0-7"})
+    assert resp.status_code == 206
+    assert resp.content == PNG_HEADER
+
+    resp = image_client.post(f"/articles/{article.id}/image", files={"file": ("a.txt", b"hello", "text/plain")})
+    assert resp.status_code == 415
+    assert image_client.get(f"/images/{body['image_hash']}/320.webp").status_code == 404
+
+
+def test_sources_wait_for_variants_and_failed_jobs_retry(image_client, session_factory, monkeypatch):
+    with session_factory() as db:
+        user = crud.create_user(db, email="img2@example.com", hashed_password="pw")
+        article = crud.create_article(db, title="Pic", content="c", author_id=user.id)
+    worker = jobs.JobWorker(session_factory, concurrency=0)
+
+    def upload():
+        resp = image_client.post(f"/articles/{article.id}/image", files={"file": ("a.png", _png(), "image/png")})
+        assert resp.status_code == 202
+        return resp.json()["images"]
+
+    def run_variants_job():
+        with session_factory() as db:
+            db.execute(delete(models.Job).where(models.Job.kind != "image_variants"))
+            db.commit()
+        assert worker.run_once() is True
+
+    def broken(*args):
+        raise OSError("disk full")
+
+    # Until the job has produced the files, only the original is advertised.
+    assert upload()["sources"] == []
+    monkeypatch.setattr(images, "schedule_variants", broken)
+    run_variants_job()
+    with session_factory() as db:
+        failed = db.execute(select(models.Job).where(models.Job.kind == "image_variants")).scalars().one()
+        failed.status = jobs.FAILED  # as if retries were exhausted
+        db.commit()
+        assert crud.get_article_with_votes(db, article.id, 0)["image_variants_ready"] is False
+
+    # Re-uploading the same bytes re-runs the failed job.
+    assert upload()["sources"] == []
+    monkeypatch.setattr(images, "schedule_variants", lambda path, width: None)
+    run_variants_job()
+    images_after = image_client.get(f"/articles/{article.id}").json()["images"]
+    assert [s["type"] for s in images_after["sources"]] == [mime for _, _, mime in images.variant_formats()]
+    # A later upload of the same content is ready straight away.
+    assert upload()["sources"] == images_after["sources"]
+
+
+def test_exif_orientation_is_applied(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotate 90° clockwise on display
+    buf = io.BytesIO()
+    Image.new("RGB", (800, 400), (10, 120, 200)).save(buf, format="JPEG", exif=exif)
+    data = buf.getvalue()
+
+    assert images.probe_width(data) == 400
+    _, path = images.store_original(data, root=tmp_path)
+    widths = images.variant_widths(images.probe_width(data))
+    assert widths == [320, 400]
+    images.generate_variants(str(path), widths, images.variant_formats())
+    with Image.open(path.parent / "320.jpg") as im:
+        assert im.size == (320, 640)
+        assert im.getexif().get(0x0112) is None
@@ -0,0 +1,61 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from bkend import crud, invalidation, models
+from bkend.cache import article_pages
+from bkend.invalidation import ChangeLogTailer, InvalidationBus, bus
+
+
+def _factory(url):
+    engine = create_engine(url, connect_args={"check_same_thread": False}, future=True)
+    return sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+
+def test_local_delivery_follows_commit_and_rollback():
+    seen = []
+    bus.subscribe("test_topic", seen.append)
+    try:
+        Session = _factory("sqlite://")
+        models.init_db(engine_override=Session.kw["bind"])
+        with Session() as db:
+            bus.publish(db, "test_topic", 1)
+            db.rollback()
+            assert seen == []
+            bus.publish(db, "test_topic", 2)
+            assert seen == []
+            db.commit()
+        assert seen == [2]
+    finally:
+        bus.unsubscribe("test_topic", seen.append)
+
+
+def test_other_process_replays_change_log(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'shared.db'}"
+    # Two engines on one file stand in for two worker processes.
+    writer, reader = _factory(url), _factory(url)
+    models.init_db(engine_override=writer.kw["bind"])
+
+    remote_bus = InvalidationBus()
+    remote_seen = []
+    remote_bus.subscribe("article", remote_seen.append)
+    tailer = ChangeLogTailer(reader, target=remote_bus)
+    tailer.start()
+    tailer.stop()
+
+    article_pages.get_or_build((0, None), lambda: b"[]")
+    with writer() as db:
+        user = crud.create_user(db, email="w@example.com", hashed_password="pw")
+        article = crud.create_article(db, title="T", content="C", author_id=user.id)
+        crud.update_article(db, article_id=article.id, title="T2", content=None)
+    # The writing process invalidates immediately, on commit, so its own
+    # tailer skips these events.
+    assert article_pages.get((0, None)) is None
+    assert tailer.poll() == 0
+
+    # Replay the log as a tailer in another worker process would.
+    tailer.last_id = 0
+    monkeypatch.setattr(invalidation, "process_origin", lambda: "other-worker")
+    assert tailer.poll() == 2
+    assert remote_seen == [article.id, article.id]
+    assert tailer.poll() == 0
+    tailer.prune()
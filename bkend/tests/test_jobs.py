@@ -0,0 +1,95 @@
+from datetime import timedelta
+import time
+
+import pytest
+
+from bkend import jobs, models
+
+
+@pytest.fixture()
+def calls(monkeypatch):
+    seen = []
+
+    def ok(db, payload):
+        seen.append(payload)
+
+    def boom(db, payload):
+        raise RuntimeError("nope")
+
+    monkeypatch.setitem(jobs.HANDLERS, "test_ok", ok)
+    monkeypatch.setitem(jobs.HANDLERS, "test_boom", boom)
+    return seen
+
+
+def test_enqueue_is_idempotent_and_runs(session_factory, calls):
+    worker = jobs.JobWorker(session_factory)
+    with session_factory() as db:
+        first = jobs.enqueue(db, "test_ok", {"n": 1}, idempotency_key="k1")
+        again = jobs.enqueue(db, "test_ok", {"n": 2}, idempotency_key="k1")
+        assert again.id == first.id
+        assert jobs.queue_stats(db)["depth"] == 1
+
+    assert worker.run_once() is True
+    assert worker.run_once() is False
+    assert calls == [{"n": 1}]
+    with session_factory() as db:
+        stats = jobs.queue_stats(db)
+        assert stats["depth"] == 0
+        assert stats["by_status"]["done"] == 1
+    assert worker.stats()["processed"] == 1
+
+
+def test_failures_back_off_then_fail(session_factory, calls):
+    worker = jobs.JobWorker(session_factory)
+    with session_factory() as db:
+        queued = jobs.enqueue(db, "test_boom", max_attempts=2)
+
+    assert worker.run_once() is True
+    with session_factory() as db:
+        retried = db.get(models.Job, queued.id)
+        assert retried.status == jobs.PENDING
+        assert retried.attempts == 1
+        assert "RuntimeError" in retried.last_error
+        assert retried.run_at > jobs._now()
+        # Not runnable until the backoff elapses.
+        assert jobs.claim_next(db) is None
+        retried.run_at = jobs._now() - timedelta(seconds=1)
+        db.commit()
+
+    assert worker.run_once() is True
+    with session_factory() as db:
+        assert db.get(models.Job, queued.id).status == jobs.FAILED
+    assert worker.stats()["failed"] == 2
+
+
+def test_expired_lease_is_reclaimed(session_factory, calls):
+    with session_factory() as db:
+        queued = jobs.enqueue(db, "test_ok", {"n": 3})
+        claimed = jobs.claim_next(db)
+        assert claimed.id == queued.id
+        # A second claimer sees nothing while the lease is held...
+        assert jobs.claim_next(db) is None
+        # ...but takes over once the (crashed) owner's lease expires.
+        claimed.locked_until = jobs._now() - timedelta(seconds=1)
+        db.commit()
+        reclaimed = jobs.claim_next(db)
+        assert reclaimed.id == queued.id
+        assert reclaimed.attempts == 2
+        assert jobs.run_job(db, reclaimed) is True
+    assert calls == [{"n": 3}]
+
+
+def test_worker_restarts_after_stop(session_factory, calls):
+    worker = jobs.JobWorker(session_factory, concurrency=1, poll_interval=0.01)
+    worker.start()
+    worker.stop()
+    worker.start()
+    try:
+        with session_factory() as db:
+            jobs.enqueue(db, "test_ok", {"n": 4})
+        deadline = time.monotonic() + 5
+        while not calls and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        worker.stop()
+    assert calls == [{"n": 4}]
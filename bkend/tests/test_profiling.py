@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from bkend import crud, models, profiling, main as app_main
+from bkend.schemas import ProfileFormat
+
+
+def _spin(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def test_sampler_sees_busy_thread_and_exports_speedscope():
+    stop = threading.Event()
+    worker = threading.Thread(target=_spin, args=(stop,), name="spinner")
+    worker.start()
+    try:
+        profile = profiling.sample(0.2, interval=0.002)
+    finally:
+        stop.set()
+        worker.join()
+
+    lines = profile.collapsed().splitlines()
+    assert any(line.startswith("thread spinner;") and "_spin (" in line for line in lines)
+    # Idle threads (e.g. blocked in Event.wait) are left out by default.
+    assert all(not line.startswith("thread MainThread;") for line in lines)
+
+    doc = profile.speedscope()
+    frames = doc["shared"]["frames"]
+    spinner = next(p for p in doc["profiles"] if p["name"] == "thread spinner")
+    assert len(spinner["samples"]) == len(spinner["weights"])
+    assert all(0 <= i < len(frames) for sample in spinner["samples"] for i in sample)
+    assert 0 < spinner["endValue"] <= 250
+
+
+def test_capture_is_capped_and_exclusive(monkeypatch):
+    monkeypatch.setattr(profiling, "MAX_CAPTURE_SECONDS", 0.05)
+    started = time.monotonic()
+    profiling.sample(60)
+    assert time.monotonic() - started < 1
+
+    admin = models.User(email="root@example.com", hashed_password="pw", is_admin=True)
+    with profiling._capture_lock:
+        with pytest.raises(HTTPException) as exc:
+            app_main.profile_sample(seconds=1, current_user=admin)
+        assert exc.value.status_code == 409
+        with pytest.raises(profiling.ProfilerBusy):
+            profiling.request_tracer.capture(1)
+
+
+def test_request_trace_profiles_matching_sync_endpoints(api_client, session_factory):
+    with session_factory() as db:
+        user = crud.create_user(db, email="author@example.com", hashed_password="pw")
+        crud.create_article(db, title="T", content="C", author_id=user.id)
+
+    result = {}
+    capture = threading.Thread(
+        target=lambda: result.update(profile=profiling.request_tracer.capture(5, "/articles", max_requests=2))
+    )
+    capture.start()
+    while not profiling.request_tracer.armed:
+        time.sleep(0.001)
+    assert api_client.get("/users/me").status_code == 401  # not under the prefix
+    for _ in range(3):
+        assert api_client.get("/articles").status_code == 200
+    capture.join()
+
+    profile = result["profile"]
+    assert profiling.request_tracer.requests == 2
+    assert not profiling.request_tracer.armed
+    lines = profile.collapsed().splitlines()
+    assert lines and all(line.startswith("GET /articles;get_articles (") for line in lines)
+    assert any("get_anonymous_article_page" in line for line in lines)
+    doc = app_main._profile_response(profile, ProfileFormat.SPEEDSCOPE)
+    assert [p["name"] for p in doc["profiles"]] == ["GET /articles"]
+
+
+def test_traced_endpoint_never_fails_the_request(monkeypatch):
+    tracer = profiling.RequestTracer()
+    endpoint = profiling.traced(lambda x: x * 2, tracer=tracer)
+    token = profiling._current_trace.set("GET /x")
+    try:
+        # Another request is being traced: run untraced.
+        with profiling._trace_lock:
+            assert endpoint(21) == 42
+
+        # Another profiler already owns the hooks (Python 3.12+ raises).
+        class Refusing(profiling.cProfile.Profile):
+            def enable(self, *args, **kwargs):
+                raise ValueError("Another profiling tool is already active")
+
+        monkeypatch.setattr(profiling.cProfile, "Profile", Refusing)
+        assert endpoint(21) == 42
+        monkeypatch.undo()
+
+        assert endpoint(21) == 42
+    finally:
+        profiling._current_trace.reset(token)
+    assert list(tracer._stats) == ["GET /x"]
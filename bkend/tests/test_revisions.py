@@ -0,0 +1,112 @@
+import random
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from bkend import crud, models, revisions, main as app_main
+from bkend.schemas import ArticleUpdate
+
+
+def test_delta_roundtrip():
+    rng = random.Random(7)
+    words = ["satire", "news", "daily", "dose", "of", "the", "\n", "  "]
+    old = " ".join(rng.choice(words) for _ in range(500))
+    for _ in range(20):
+        tokens = old.split(" ")
+        i = rng.randrange(len(tokens))
+        tokens[i:i + rng.randrange(3)] = [rng.choice(words) for _ in range(rng.randrange(4))]
+        new = " ".join(tokens)
+        assert revisions.apply_delta(old, revisions.make_delta(old, new)) == new
+        old = new
+    assert revisions.apply_delta("abc", revisions.make_delta("abc", "")) == ""
+    assert revisions.apply_delta("", revisions.make_delta("", "fresh text")) == "fresh text"
+
+
+def test_history_is_delta_encoded_with_snapshots(db_session, monkeypatch):
+    monkeypatch.setattr(revisions, "SNAPSHOT_INTERVAL", 4)
+    user = crud.create_user(db_session, email="ed@example.com", hashed_password="pw")
+    body = " ".join(f"sentence {i} of a long satirical piece." for i in range(2000))
+    article = crud.create_article(db_session, title="v1", content=body, author_id=user.id)
+    contents = [body]
+    for n in range(2, 11):
+        body = body.replace(f"sentence {n * 7} ", f"sentence {n * 7}! ")
+        contents.append(body)
+        crud.update_article(db_session, article_id=article.id, title=f"v{n}", content=body, editor_id=user.id)
+
+    history = revisions.list_revisions(db_session, article.id)
+    assert [h["rev"] for h in history] == list(range(1, 11))
+    assert [h["is_snapshot"] for h in history] == [n % 4 == 1 for n in range(1, 11)]
+    # A one-character fix costs far less than the article itself.
+    delta_sizes = [h["stored_bytes"] for h in history if not h["is_snapshot"]]
+    assert max(delta_sizes) * 20 < history[0]["stored_bytes"]
+
+    for rev, expected in enumerate(contents, start=1):
+        revision = revisions.get_revision(db_session, article.id, rev)
+        assert revision["content"] == expected
+        assert revision["title"] == f"v{rev}"
+    assert revisions.get_revision(db_session, article.id, 11) is None
+
+
+def test_legacy_article_gets_baseline_and_endpoints(db_session):
+    admin = crud.create_user(db_session, email="adm@example.com", hashed_password="pw")
+    admin.is_admin = True
+    # Simulate an article created before revision history existed.
+    legacy = models.Article(title="Old", content="original text", author_id=admin.id)
+    db_session.add(legacy)
+    db_session.commit()
+
+    app_main.update_article(
+        article_id=legacy.id,
+        article_update=ArticleUpdate(content="edited text"),
+        _current_user=admin,
+        db=db_session,
+    )
+    history = app_main.get_article_revisions(article_id=legacy.id, current_user=admin, db=db_session)
+    assert [h["rev"] for h in history] == [1, 2]
+    assert history[1]["editor_id"] == admin.id
+
+    old = app_main.get_article(article_id=legacy.id, current_user=admin, db=db_session, rev=1)
+    assert old["content"] == "original text"
+    assert app_main.get_article(article_id=legacy.id, current_user=None, db=db_session)["content"] == "edited text"
+    with pytest.raises(HTTPException) as exc:
+        app_main.get_article(article_id=legacy.id, current_user=admin, db=db_session, rev=3)
+    assert exc.value.status_code == 404
+    # Past versions are admin-only.
+    reader = crud.create_user(db_session, email="reader@example.com", hashed_password="pw")
+    for user, code in ((None, 401), (reader, 403)):
+        with pytest.raises(HTTPException) as exc:
+            app_main.get_article(article_id=legacy.id, current_user=user, db=db_session, rev=1)
+        assert exc.value.status_code == code
+
+    crud.delete_article(db_session, article_id=legacy.id)
+    assert db_session.execute(select(models.ArticleRevision)).first() is None
+
+
+def test_concurrent_edit_takes_next_rev(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'race.db'}", connect_args={"check_same_thread": False})
+    models.init_db(engine_override=engine)
+    Session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    with Session() as db:
+        user = crud.create_user(db, email="race@example.com", hashed_password="pw")
+        article = crud.create_article(db, title="T", content="one", author_id=user.id)
+
+    real_latest_rev = revisions.latest_rev
+    raced = []
+
+    def latest_rev_then_race(db, article_id):
+        rev = real_latest_rev(db, article_id)
+        if not raced:
+            # Another editor commits between our read and our write.
+            raced.append(True)
+            with Session() as other:
+                crud.update_article(other, article_id=article_id, title=None, content="two")
+        return rev
+
+    monkeypatch.setattr(revisions, "latest_rev", latest_rev_then_race)
+    with Session() as db:
+        crud.update_article(db, article_id=article.id, title=None, content="three")
+        assert [h["rev"] for h in revisions.list_revisions(db, article.id)] == [1, 2, 3]
+        assert revisions.get_revision(db, article.id, 2)["content"] == "two"
+        assert revisions.get_revision(db, article.id, 3)["content"] == "three"
@@ -0,0 +1,23 @@
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def test_import_does_no_database_or_heavy_dependency_work(tmp_path):
+    db_path = tmp_path / "untouched.db"
+    probe = (
+        "import sys, bkend.main; "
+        "print(','.join(m for m in ('passlib', 'jose', 'PIL') if m in sys.modules))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", probe],
+        env={"DATABASE_URL": f"sqlite:///{db_path}", "PYTHONPATH": str(ROOT)},
+        cwd=tmp_path,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+    assert out == ""
+    assert not db_path.exists()
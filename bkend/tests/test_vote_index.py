@@ -0,0 +1,63 @@
+from bkend import crud
+from bkend.schemas import VoteType
+from bkend.vote_index import UserVotes, vote_index
+
+
+def test_user_votes_sorted_arrays():
+    votes = UserVotes([(5, VoteType.UPVOTE), (2, VoteType.DOWNVOTE), (1, VoteType.UPVOTE)])
+    assert list(votes.up) == [1, 5]
+    assert votes.vote_for(5) == "upvote"
+    assert votes.vote_for(2) == "downvote"
+    assert votes.vote_for(3) is None
+    votes.set(2, VoteType.UPVOTE)
+    assert list(votes.up) == [1, 2, 5] and len(votes.down) == 0
+    votes.set(5, None)
+    assert votes.vote_for(5) is None
+    assert len(votes) == 2
+
+
+def test_page_overlay_uses_index_updated_in_place(db_session):
+    user = crud.create_user(db_session, email="v@example.com", hashed_password="pw")
+    a1 = crud.create_article(db_session, title="A", content="a", author_id=user.id)
+    a2 = crud.create_article(db_session, title="B", content="b", author_id=user.id)
+    crud.add_or_toggle_vote(db_session, article_id=a1.id, user_id=user.id, vote_type=VoteType.UPVOTE)
+
+    page = crud.get_article_page_for_user(db_session, user.id)
+    assert [row["user_vote"] for row in page] == ["upvote", None]
+    cached = vote_index.get(db_session, user.id)
+
+    crud.add_or_toggle_vote(db_session, article_id=a2.id, user_id=user.id, vote_type=VoteType.DOWNVOTE)
+    crud.add_or_toggle_vote(db_session, article_id=a1.id, user_id=user.id, vote_type=VoteType.UPVOTE)
+    # Same object, updated in place rather than reloaded.
+    assert vote_index.get(db_session, user.id) is cached
+    page = crud.get_article_page_for_user(db_session, user.id)
+    assert [row["user_vote"] for row in page] == [None, "downvote"]
+    assert page[1]["downvotes"] == 1
+
+    crud.remove_vote(db_session, article_id=a2.id, user_id=user.id)
+    assert cached.vote_for(a2.id) is None
+
+    crud.add_or_toggle_vote(db_session, article_id=a1.id, user_id=user.id, vote_type=VoteType.UPVOTE)
+    crud.delete_article(db_session, article_id=a1.id)
+    assert cached.vote_for(a1.id) is None
+
+
+def test_overlay_needs_no_queries_when_warm(db_session):
+    from sqlalchemy import event
+
+    user = crud.create_user(db_session, email="q@example.com", hashed_password="pw")
+    crud.create_article(db_session, title="A", content="a", author_id=user.id)
+    crud.get_article_page_for_user(db_session, user.id)
+
+    statements = []
+    engine = db_session.get_bind()
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        crud.get_article_page_for_user(db_session, user.id)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert statements == []
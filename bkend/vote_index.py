@@ -0,0 +1,126 @@
+"""Compact per-user vote state for overlaying ``user_vote`` onto cached pages.
+
+A user's votes are held as two sorted ``array('I')`` of article ids (4 bytes
+per vote), loaded with a single query and kept in a bounded LRU. Lookups are
+a binary search, so overlaying a page costs microseconds and no queries even
+for users with hundreds of thousands of votes. Vote writes update the cached
+entry in place; other worker processes drop theirs via the invalidation bus.
+"""
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .models import Vote
+from .schemas import VoteType
+
+
+def _contains(ids: array, article_id: int) -> bool:
+    i = bisect_left(ids, article_id)
+    return i < len(ids) and ids[i] == article_id
+
+
+def _insert(ids: array, article_id: int) -> None:
+    i = bisect_left(ids, article_id)
+    if i == len(ids) or ids[i] != article_id:
+        ids.insert(i, article_id)
+
+
+def _discard(ids: array, article_id: int) -> None:
+    i = bisect_left(ids, article_id)
+    if i < len(ids) and ids[i] == article_id:
+        del ids[i]
+
+
+class UserVotes:
+    __slots__ = ("up", "down")
+
+    def __init__(self, rows: Iterable[Tuple[int, VoteType]] = ()) -> None:
+        up, down = [], []
+        for article_id, vote_type in rows:
+            (up if vote_type == VoteType.UPVOTE else down).append(article_id)
+        self.up = array("I", sorted(up))
+        self.down = array("I", sorted(down))
+
+    def vote_for(self, article_id: int) -> Optional[str]:
+        if _contains(self.up, article_id):
+            return VoteType.UPVOTE.value
+        if _contains(self.down, article_id):
+            return VoteType.DOWNVOTE.value
+        return None
+
+    def set(self, article_id: int, vote_type: Optional[VoteType]) -> None:
+        """Record the user's current vote on ``article_id`` (None = no vote)."""
+        _discard(self.up, article_id)
+        _discard(self.down, article_id)
+        if vote_type == VoteType.UPVOTE:
+            _insert(self.up, article_id)
+        elif vote_type == VoteType.DOWNVOTE:
+            _insert(self.down, article_id)
+
+    def __len__(self) -> int:
+        return len(self.up) + len(self.down)
+
+
+class VoteIndex:
+    """Bounded LRU of :class:`UserVotes` keyed by user id."""
+
+    def __init__(self, maxsize: int = 10000) -> None:
+        self.maxsize = maxsize
+        self._users: "OrderedDict[int, UserVotes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def get(self, db: Session, user_id: int) -> UserVotes:
+        with self._lock:
+            votes = self._users.get(user_id)
+            if votes is not None:
+                self._users.move_to_end(user_id)
+                return votes
+            generation = self._generation
+        rows = db.execute(select(Vote.article_id, Vote.vote_type).where(Vote.user_id == user_id)).all()
+        votes = UserVotes(rows)
+        with self._lock:
+            # A vote written while we were loading may be missing from rows;
+            # serve this copy but don't cache it.
+            if generation == self._generation:
+                self._users[user_id] = votes
+                if len(self._users) > self.maxsize:
+                    self._users.popitem(last=False)
+        return votes
+
+    def apply(self, user_id: int, article_id: int, vote_type: Optional[VoteType]) -> None:
+        """Update a cached user in place after their vote was committed."""
+        with self._lock:
+            self._generation += 1
+            votes = self._users.get(user_id)
+            if votes is not None:
+                votes.set(article_id, vote_type)
+
+    def invalidate(self, user_id: Optional[int]) -> None:
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_id, None)
+
+    def discard_article(self, article_id: Optional[int]) -> None:
+        """Forget a deleted article for every cached user (its votes cascade away)."""
+        with self._lock:
+            self._generation += 1
+            if article_id is None:
+                self._users.clear()
+                return
+            for votes in self._users.values():
+                votes.set(article_id, None)
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+
+vote_index = VoteIndex()
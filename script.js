@@ -25,6 +25,10 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // --- Articles fetching and rendering ---
     const articlesContainer = document.getElementById('articles-container');
+    // When served by the backend the page sets data-api-base="" (same origin).
+    const apiBase = body.dataset.apiBase ?? 'http://localhost:8000';
+    // Set in index.html; the backend rewrites it to the hashed asset URL.
+    const fallbackImage = articlesContainer.dataset.fallbackImage;
 
     function formatDate(isoString) {
         try {
@@ -35,12 +39,34 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // Article images come with per-format srcsets (AVIF/WebP/JPEG variants);
+    // the browser picks the smallest suitable one.
+    function renderImage(images) {
+        const img = document.createElement('img');
+        img.alt = 'Satirical Image';
+        img.loading = 'lazy';
+        img.decoding = 'async';
+        if (!images) {
+            img.src = fallbackImage;
+            return img;
+        }
+        img.src = `${apiBase}${images.src}`;
+        const picture = document.createElement('picture');
+        for (const source of images.sources) {
+            const el = document.createElement('source');
+            el.type = source.type;
+            el.srcset = source.srcset.replace(/(^|, )\//g, `$1${apiBase}/`);
+            el.sizes = '(max-width: 600px) 100vw, 600px';
+            picture.appendChild(el);
+        }
+        picture.appendChild(img);
+        return picture;
+    }
+
     function renderArticle(article) {
         const el = document.createElement('article');
 
-        const img = document.createElement('img');
-        img.src = './media/cfclasspic.png';
-        img.alt = 'Satirical Image';
+        const img = renderImage(article.images);
 
         const topic = document.createElement('span');
         topic.className = 'topic';
@@ -70,11 +96,19 @@ document.addEventListener('DOMContentLoaded', function() {
         return el;
     }
 
-    async function loadArticles() {
+    // With skip > 0 the articles are appended after those already shown.
+    async function loadArticles(skip = 0) {
         try {
-            const resp = await fetch('http://localhost:8000/articles');
+            const query = skip ? `?skip=${skip}` : '';
+            const resp = await fetch(`${apiBase}/articles${query}`);
             if (!resp.ok) throw new Error(`HTTP ${resp.status}`);
             const articles = await resp.json();
+            if (skip) {
+                for (const a of articles) {
+                    articlesContainer.appendChild(renderArticle(a));
+                }
+                return;
+            }
             articlesContainer.innerHTML = '';
             if (!Array.isArray(articles) || articles.length === 0) {
                 articlesContainer.textContent = 'No articles available.';
@@ -85,10 +119,26 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         } catch (err) {
             console.error('Failed to load articles', err);
+            if (skip) {
+                // Keep the articles already shown; just note the rest are missing.
+                const notice = document.createElement('p');
+                notice.className = 'load-error';
+                notice.textContent = 'Failed to load more articles.';
+                articlesContainer.appendChild(notice);
+                return;
+            }
             articlesContainer.textContent = 'Failed to load articles.';
         }
     }
 
-    // Load on startup
-    loadArticles();
+    // Load on startup. When the server already rendered the first page,
+    // fetch only the articles after it (if that page was full).
+    if (articlesContainer.dataset.prerendered === 'true') {
+        const firstPageSize = Number(articlesContainer.dataset.firstPageSize);
+        if (articlesContainer.querySelectorAll('article').length >= firstPageSize) {
+            loadArticles(firstPageSize);
+        }
+    } else {
+        loadArticles();
+    }
 });
\ No newline at end of file